@@ -0,0 +1,206 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from grid import load_level
+from utils import level_cache
+
+VERSION = 1
+
+# (dy, dx) of the four push directions
+OFFSETS = ((0, -1), (-1, 0), (0, 1), (1, 0))
+
+
+def shift(values, dy, dx, fill):
+    # value of the neighbour at (y + dy, x + dx) for every cell, fill where that is off the map
+    height, width = values.shape
+    shifted = np.full_like(values, fill)
+    shifted[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+        values[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+    return shifted
+
+
+def flood(mask, seed):
+    # cells of mask connected to seed
+    region = seed & mask
+    while True:
+        grown = region.copy()
+        for dy, dx in OFFSETS:
+            grown |= shift(region, dy, dx, False)
+        grown &= mask
+        if np.array_equal(grown, region):
+            return region
+        region = grown
+
+
+def pushable_to(floor, targets):
+    # cells a lone box can be pushed from onto one of targets: pushing towards d needs floor on both sides
+    live = targets.copy()
+    while True:
+        grown = live.copy()
+        for dy, dx in OFFSETS:
+            grown |= floor & shift(floor, -dy, -dx, False) & shift(live, dy, dx, False)
+        if np.array_equal(grown, live):
+            return live
+        live = grown
+
+
+def pushable_from(floor, sources):
+    # cells a lone box starting on one of sources can be pushed to
+    reached = sources.copy()
+    while True:
+        grown = reached.copy()
+        for dy, dx in OFFSETS:
+            grown |= floor & shift(reached & shift(floor, -dy, -dx, False), -dy, -dx, False)
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+
+def label_regions(mask):
+    # connected components of mask numbered from 1, 0 elsewhere
+    outside = mask.size
+    labels = np.where(mask, np.arange(mask.size).reshape(mask.shape), outside)
+    while True:
+        smallest = labels.copy()
+        for dy, dx in OFFSETS:
+            np.minimum(smallest, shift(labels, dy, dx, outside), out=smallest)
+        smallest[~mask] = outside
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+    _, numbered = np.unique(labels, return_inverse=True)
+    numbered = numbered.reshape(mask.shape).astype(np.int32) + 1
+    numbered[~mask] = 0
+    return numbered
+
+
+def analyse(grid):
+    # static maps of a level, every one a (height, width) array
+    shape = (grid.height, grid.width)
+    walls = np.frombuffer(bytes(grid.tiles), dtype=np.uint8).reshape(shape).astype(bool)
+    floor = ~walls
+    goals = np.zeros(shape, dtype=bool)
+    goals.flat[sorted(grid.goals)] = True
+    boxes = np.zeros(shape, dtype=bool)
+    boxes.flat[sorted(grid.boxes)] = True
+
+    # the part of the map the player and boxes can ever get to
+    start = np.zeros(shape, dtype=bool)
+    if grid.player_start is not None:
+        start.flat[grid.player_start] = True
+    inside = flood(floor, start | boxes)
+
+    # a box on a dead square can never reach any goal
+    dead = inside & ~pushable_to(floor & inside, goals)
+
+    # goals no box can be pushed onto
+    unreachable_goals = goals & ~pushable_from(floor & inside, boxes)
+
+    # one tile wide passages, and tunnels where a passage runs on for more than a cell
+    wall_up, wall_down = shift(walls, -1, 0, True), shift(walls, 1, 0, True)
+    wall_left, wall_right = shift(walls, 0, -1, True), shift(walls, 0, 1, True)
+    across = inside & wall_up & wall_down & ~(wall_left & wall_right)
+    along = inside & wall_left & wall_right & ~(wall_up & wall_down)
+    corridors = across | along
+    tunnels = (across & (shift(across, 0, -1, False) | shift(across, 0, 1, False))) | \
+        (along & (shift(along, -1, 0, False) | shift(along, 1, 0, False)))
+
+    # rooms are what is left once the corridors are taken out
+    rooms = label_regions(inside & ~corridors)
+
+    return {
+        "inside": inside,
+        "dead": dead,
+        "corridors": corridors,
+        "tunnels": tunnels,
+        "rooms": rooms,
+        "unreachable_goals": unreachable_goals,
+        "dead_boxes": boxes & dead,
+    }
+
+
+def dead_cells(maps):
+    # dead squares as grid cell indices
+    return frozenset(np.flatnonzero(maps["dead"]).tolist())
+
+
+def cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, ".cache", os.path.splitext(name)[0] + ".analysis.npz")
+
+
+def load_analysis(path, force=False):
+    # maps from the cache next to the level, recomputed when the .tmx changed
+    cached = cache_path(path)
+    stat = np.array([VERSION, *level_cache.source_stat(path)], dtype=np.int64)
+    if not force and os.path.exists(cached):
+        try:
+            with np.load(cached) as data:
+                if np.array_equal(data["source_stat"], stat):
+                    return {name: data[name] for name in data.files if name != "source_stat"}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    maps = analyse(load_level(path))
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    temp_path = f"{cached}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(f, source_stat=stat, **maps)
+    os.replace(temp_path, cached)
+    return maps
+
+
+def analyse_level(job):
+    path, force = job
+    start_time = time.perf_counter()
+    maps = load_analysis(path, force)
+    summary = {
+        "dead": int(maps["dead"].sum()),
+        "corridors": int(maps["corridors"].sum()),
+        "tunnels": int(maps["tunnels"].sum()),
+        "rooms": int(maps["rooms"].max()),
+        "unreachable_goals": int(maps["unreachable_goals"].sum()),
+        "dead_boxes": int(maps["dead_boxes"].sum()),
+    }
+    return path, summary, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static analysis of levels: dead squares, corridors, tunnels and rooms.")
+    parser.add_argument("paths", nargs="*", default=["levels"], help=".tmx files or directories of them")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: cpu count)")
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    args = parser.parse_args()
+
+    jobs = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            jobs.extend((os.path.join(path, name), args.force) for name in sorted(os.listdir(path)) if name.endswith(".tmx"))
+        else:
+            jobs.append((path, args.force))
+
+    workers = args.workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (4 * workers))
+
+    start_time = time.perf_counter()
+    broken = 0
+    with ProcessPoolExecutor(workers) as pool:
+        for path, summary, elapsed in pool.map(analyse_level, jobs, chunksize=chunksize):
+            # boxes stuck on dead squares or goals no box can reach make a level unsolvable
+            unsolvable = summary["unreachable_goals"] or summary["dead_boxes"]
+            broken += bool(unsolvable)
+            details = " ".join(f"{key}={value}" for key, value in summary.items())
+            print(f"{path}: {'UNSOLVABLE' if unsolvable else 'OK'} {details} time={elapsed * 1000:.2f}ms")
+    elapsed = time.perf_counter() - start_time
+
+    print(f"{len(jobs)} levels in {elapsed:.2f}s ({len(jobs) / elapsed if elapsed else 0:.1f} levels/s), {broken} unsolvable")
+    sys.exit(1 if broken else 0)
+
+
+if __name__ == "__main__":
+    main()
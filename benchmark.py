@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# benchmarks always run without a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from grid import LevelGrid, WALL
+from utils.tmx_writer import write_level
+from utils.save_game import saves, default_data
+from utils import level_cache
+from game import Game
+
+SIZES = (16, 32, 64, 128, 256)
+METRICS = ("load_cold_ms", "load_warm_ms", "idle_frame_ms", "push_ms", "render_ms")
+
+
+def synthetic_level(size, box_density, seed):
+    # border walls, a pillar every 4 cells, boxes on cells whose row neighbours are always free
+    rng = random.Random(seed)
+    grid = LevelGrid(size, size)
+    for y in range(size):
+        for x in range(size):
+            if x in (0, size - 1) or y in (0, size - 1) or (x % 4 == 0 and y % 4 == 0):
+                grid.tiles[grid.index(x, y)] = WALL
+
+    slots = [grid.index(x, y) for y in range(2, size - 2, 4) for x in range(2, size - 2, 4)]
+    count = max(1, int(len(slots) * box_density))
+    grid.boxes.update(rng.sample(slots, count))
+
+    free = [cell for cell in range(size * size) if not grid.is_wall(cell) and cell not in grid.boxes]
+    grid.goals.update(rng.sample(free, count))
+    grid.player_start = next(cell for cell in free if cell not in grid.goals)
+    return grid
+
+
+def timed(function, repeat):
+    # median milliseconds per call
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_level(levels_dir, size, repeat):
+    path = os.path.join(levels_dir, f"{size}_level.tmx")
+    game = Game(size, levels_dir)
+    results = {"boxes": len(game.grid.boxes), "cells": size * size}
+
+    def load_cold():
+        shutil.rmtree(os.path.join(levels_dir, ".cache"), ignore_errors=True)
+        level_cache.pending.pop(path, None)
+        game.unload_map()
+        game.setup_map()
+
+    def load_warm():
+        level_cache.pending.pop(path, None)
+        game.unload_map()
+        game.setup_map()
+
+    results["load_cold_ms"] = timed(load_cold, max(1, repeat // 10))
+    results["load_warm_ms"] = timed(load_warm, max(1, repeat // 10))
+
+    # the whole per-frame path with no input: events, camera, save check, button hover, HUD and draw
+    results["idle_frame_ms"] = timed(lambda: game.tick(0, []), repeat)
+
+    def render():
+        game.all_sprites.repaint_rect(game.screen.get_rect())
+        game.all_sprites.draw(game.screen)
+        pygame.display.update()
+
+    results["render_ms"] = timed(render, repeat)
+
+    # push the same box right and take it back, timing only the push
+    box = next(iter(game.boxes.values()))
+    behind = game.grid.position_of(game.grid.neighbour(box.cell, -1, 0))
+    center = (behind[0] + game.grid.tile_size / 2, behind[1] + game.grid.tile_size / 2)
+    samples = []
+    for _ in range(repeat):
+        game.player.place(center)
+        game.player.direction.update(1, 0)
+        start = time.perf_counter()
+        game.player.move(0)
+        samples.append((time.perf_counter() - start) * 1000)
+        game.player.undo()
+    results["push_ms"] = statistics.median(samples)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # metrics that got slower than baseline * (1 + tolerance)
+    regressions = []
+    for size, metrics in results["levels"].items():
+        for metric in METRICS:
+            before = baseline.get("levels", {}).get(size, {}).get(metric)
+            if before and metrics[metric] > before * (1 + tolerance):
+                regressions.append(f"{size} {metric}: {before:.4f} -> {metrics[metric]:.4f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time level load, idle frames, pushes and rendering on synthetic levels.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="tiles per side")
+    parser.add_argument("--box-density", type=float, default=0.5, help="fraction of box slots filled")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "levels": {},
+    }
+    levels_dir = tempfile.mkdtemp(prefix="sokoban-bench-")
+
+    # keep benchmark moves out of the real save file, they go to a throwaway one next to the levels
+    saves.path = os.path.join(levels_dir, "game.json")
+    saves.data = default_data()
+    try:
+        for size in args.sizes:
+            write_level(os.path.join(levels_dir, f"{size}_level.tmx"), synthetic_level(size, args.box_density, args.seed))
+            results["levels"][f"{size}x{size}"] = metrics = bench_level(levels_dir, size, args.repeat)
+            print(f"{size}x{size}: " + " ".join(f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}" for key, value in metrics.items()))
+    finally:
+        # the last write has to land before its directory goes
+        saves.close()
+        shutil.rmtree(levels_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,154 +1,64 @@
 import pygame
 import os
 
-class Box(pygame.sprite.Sprite):
+from settings import DEAD_BOX_TINT, SELECTED_BOX_TINT
+from utils.assets import assets
+
+class Box(pygame.sprite.DirtySprite):
     def __init__(
         self,
         position,
         surface,
-        marker_points,
-        player_sprite: pygame.sprite.Sprite,
-        collision_boxes: pygame.sprite.Group,
-        same_type_boxes: pygame.sprite.Group,
+        grid,
+        camera,
         groups,
     ):
         super().__init__(groups)
         self.surface = surface
-        self.alt_surface = pygame.image.load(os.path.join("assets", "graphics", "box-dark.png")).convert_alpha()
-        self.image = self.surface
-        self.rect = self.image.get_frect(topleft=position)
-        self.player_sprite = player_sprite
-        self.collision_boxes = collision_boxes
-        self.same_type_boxes = same_type_boxes
-        self.marker_points = marker_points
-
-    def move_with_player(self):
-        if self.rect.colliderect(self.player_sprite.hitbox_rect):
-            # Get grid dimensions based on box size
-            grid_width = self.rect.width
-            grid_height = self.rect.height
-
-            # Calculate target grid position
-            target_rect = self.rect.copy()
-
-            if self.player_sprite.direction.x != 0:
-                if self.player_sprite.direction.x > 0:
-                    target_rect.x += grid_width  # Move one grid cell right
-                elif self.player_sprite.direction.x < 0:
-                    target_rect.x -= grid_width  # Move one grid cell left
-
-                # Check if target position is free
-                if self.is_target_position_free(target_rect):
-                    self.rect = target_rect
-                    # Adjust player position to stay aligned
-                    if self.player_sprite.direction.x > 0:
-                        self.player_sprite.hitbox_rect.right = self.rect.left
-                    else:
-                        self.player_sprite.hitbox_rect.left = self.rect.right
-                else:
-                    # Block player movement if box can't move
-                    if self.player_sprite.direction.x > 0:
-                        self.player_sprite.hitbox_rect.right = self.rect.left
-                    else:
-                        self.player_sprite.hitbox_rect.left = self.rect.right
-
-            elif self.player_sprite.direction.y != 0:
-                if self.player_sprite.direction.y > 0:
-                    target_rect.y += grid_height  # Move one grid cell down
-                elif self.player_sprite.direction.y < 0:
-                    target_rect.y -= grid_height  # Move one grid cell up
-
-                # Check if target position is free
-                if self.is_target_position_free(target_rect):
-                    self.rect = target_rect
-                    # Adjust player position to stay aligned
-                    if self.player_sprite.direction.y > 0:
-                        self.player_sprite.hitbox_rect.bottom = self.rect.top
-                    else:
-                        self.player_sprite.hitbox_rect.top = self.rect.bottom
-                else:
-                    # Block player movement if box can't move
-                    if self.player_sprite.direction.y > 0:
-                        self.player_sprite.hitbox_rect.bottom = self.rect.top
-                    else:
-                        self.player_sprite.hitbox_rect.top = self.rect.bottom
-
-    def is_target_position_free(self, target_rect):
-        # Check collision with walls/obstacles
-        for sprite in self.collision_boxes:
-            if sprite.rect.colliderect(target_rect):
-                return False
+        self.alt_surface = assets.image(os.path.join("assets", "graphics", "box-dark.png"))
+        self.dead_surface = None
+        self.selected = False
+        self.rect = self.surface.get_frect(topleft=position)
+        self.grid = grid
+        self.camera = camera
+        self.cell = grid.cell_at(position)
+        self.check_marker_point()
 
-        # Check collision with other boxes
-        for other_box in self.same_type_boxes:
-            if other_box != self and other_box.rect.colliderect(target_rect):
-                return False
+    def move_with_player(self, direction):
+        # Move one grid cell in the push direction, the player already checked it is free
+        target = self.grid.neighbour(self.cell, int(direction.x), int(direction.y))
+        self.grid.move_box(self.cell, target)
+        self.place(target)
 
-        return True
+    def place(self, cell):
+        self.cell = cell
+        self.update_rect()
+        self.check_marker_point()
 
-    def is_colliding_box(self, direction):
-        # check collisions with collision boxes
-        for sprite in self.collision_boxes:
-            if sprite.rect.colliderect(self.rect):
-                if direction == "horizontal":
-                    if self.player_sprite.direction.x > 0:
-                        self.rect.right = sprite.rect.left
-                        self.player_sprite.hitbox_rect.right = self.rect.left
-                    if self.player_sprite.direction.x < 0:
-                        self.rect.left = sprite.rect.right
-                        self.player_sprite.hitbox_rect.left = self.rect.right
-                elif direction == "vertical":
-                    if self.player_sprite.direction.y > 0:
-                        self.rect.bottom = sprite.rect.top
-                        self.player_sprite.hitbox_rect.bottom = self.rect.top
-                    if self.player_sprite.direction.y < 0:
-                        self.rect.top = sprite.rect.bottom
-                        self.player_sprite.hitbox_rect.top = self.rect.bottom
+    def update_rect(self):
+        # screen position under the current camera
+        self.rect.topleft = self.camera.to_screen(self.grid.position_of(self.cell))
+        self.dirty = 1
 
-        # check collisions with same type boxes
-        for other_box in self.same_type_boxes:
-            if other_box != self and other_box.rect.colliderect(self.rect):
-                if direction == "horizontal":
-                    if self.player_sprite.direction.x > 0:
-                        self.rect.right = other_box.rect.left
-                        self.player_sprite.hitbox_rect.right = self.rect.left
-                    if self.player_sprite.direction.x < 0:
-                        self.rect.left = other_box.rect.right
-                        self.player_sprite.hitbox_rect.left = self.rect.right
-                elif direction == "vertical":
-                    if self.player_sprite.direction.y > 0:
-                        self.rect.bottom = other_box.rect.top
-                        self.player_sprite.hitbox_rect.bottom = self.rect.top
-                    if self.player_sprite.direction.y < 0:
-                        self.rect.top = other_box.rect.bottom
-                        self.player_sprite.hitbox_rect.top = self.rect.bottom
+    def set_selected(self, selected):
+        self.selected = selected
+        self.check_marker_point()
 
     def check_marker_point(self):
-        on_marker = False
-        for point in self.marker_points:
-            if self.rect.collidepoint(point):
-                on_marker = True
-                break
-
-        if on_marker:
-            self.image = self.alt_surface
+        # only runs when the box moves or is selected, so the dead square warning costs nothing per frame
+        if self.cell in self.grid.goals:
+            image = self.alt_surface
+        elif self.cell in self.grid.dead:
+            if self.dead_surface is None:
+                self.dead_surface = self.surface.copy()
+                self.dead_surface.fill(DEAD_BOX_TINT, special_flags=pygame.BLEND_RGB_MULT)
+            image = self.dead_surface
         else:
-            self.image = self.surface
-            
-    def check_level_completion(self):
-        for point in self.marker_points:
-            if not any(box.rect.collidepoint(point) for box in self.same_type_boxes):
-                return False
-        return True
-
-    def update(self, dt):
-        self.move_with_player()
-        self.check_marker_point()
-        self.player_sprite.level_completed = self.check_level_completion()
-
-
-class CollisionBox(pygame.sprite.Sprite):
-    def __init__(self, position, surface, groups):
-        super().__init__(groups)
-        self.image = surface
-        self.rect = self.image.get_frect(topleft=position)
+            image = self.surface
+
+        # click-to-move selection, lightened on top of whichever image applies
+        if self.selected:
+            image = image.copy()
+            image.fill(SELECTED_BOX_TINT, special_flags=pygame.BLEND_RGB_ADD)
+        self.image = image
+        self.dirty = 1
@@ -0,0 +1,78 @@
+import pygame
+from collections import OrderedDict
+
+# walls are pre-rendered in square chunks of this many tiles, and only the most recently
+# seen chunks are kept so memory depends on the screen size, not the level size
+CHUNK_TILES = 8
+CHUNK_CACHE = 48
+
+
+class Camera:
+    def __init__(self, grid, viewport):
+        self.grid = grid
+        self.viewport = viewport
+        self.chunk_size = CHUNK_TILES * grid.tile_size
+        self.world_size = (grid.width * grid.tile_size, grid.height * grid.tile_size)
+        self.offset = (0, 0)
+
+        # (chunk x, chunk y) -> [(tile surface, position inside the chunk)]
+        self.chunk_tiles = {}
+        self.chunk_surfaces = OrderedDict()
+
+    def add_tile(self, cell, surface):
+        x, y = self.grid.position_of(cell)
+        key = (x // self.chunk_size, y // self.chunk_size)
+        self.chunk_tiles.setdefault(key, []).append((surface, (x % self.chunk_size, y % self.chunk_size)))
+
+    def follow(self, position):
+        # centre the view on position, clamped to the level, returns True when the view moved
+        offset = tuple(
+            int(min(max(position[axis] - self.viewport[axis] / 2, 0), max(0, self.world_size[axis] - self.viewport[axis])))
+            for axis in (0, 1)
+        )
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        return True
+
+    def to_screen(self, position):
+        return position[0] - self.offset[0], position[1] - self.offset[1]
+
+    def to_world(self, position):
+        return position[0] + self.offset[0], position[1] + self.offset[1]
+
+    def visible_range(self, size):
+        # first and last (inclusive) index of size-pixel blocks on screen, per axis
+        return [
+            (self.offset[axis] // size, (self.offset[axis] + self.viewport[axis] - 1) // size)
+            for axis in (0, 1)
+        ]
+
+    def visible_cells(self):
+        (left, right), (top, bottom) = self.visible_range(self.grid.tile_size)
+        right, bottom = min(right, self.grid.width - 1), min(bottom, self.grid.height - 1)
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                yield self.grid.index(x, y)
+
+    def chunk_surface(self, key):
+        surface = self.chunk_surfaces.get(key)
+        if surface is not None:
+            self.chunk_surfaces.move_to_end(key)
+            return surface
+
+        surface = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+        surface.fblits(self.chunk_tiles[key])
+        self.chunk_surfaces[key] = surface
+        if len(self.chunk_surfaces) > CHUNK_CACHE:
+            self.chunk_surfaces.popitem(last=False)
+        return surface
+
+    def draw(self, surface):
+        # blit only the wall chunks that overlap the view
+        (left, right), (top, bottom) = self.visible_range(self.chunk_size)
+        for chunk_y in range(top, bottom + 1):
+            for chunk_x in range(left, right + 1):
+                if (chunk_x, chunk_y) in self.chunk_tiles:
+                    position = self.to_screen((chunk_x * self.chunk_size, chunk_y * self.chunk_size))
+                    surface.blit(self.chunk_surface((chunk_x, chunk_y)), position)
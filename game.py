@@ -1,146 +1,366 @@
 import pygame
 import os
-import sys
 import time
-from pytmx.util_pygame import load_pygame
 
-from settings import FPS, DISPLAY_RESOLUTION, WIDTH, HEIGHT
+from settings import DISPLAY_RESOLUTION, WIDTH, DIRTY_RENDERING, RECORD_REPLAYS, REPLAY_DIR, REPLAY_KEEP, PROFILER_TRACE_PATH, LEVEL_PACK, HIGHLIGHT_DEAD_SQUARES, PUSH_SEARCH_LIMIT
+from scenes import Scene, SceneManager, TransitionScene
 from player import Player
-from boxes import Box, CollisionBox
+from boxes import Box
+from camera import Camera
+from pathfinding import Reachability, push_path
+import analysis
 
-from utils.save_game import load_game_level, save_game
+from utils.save_game import load_game_level, save_game, saves
 from utils.button import Button
+from utils.assets import assets
+from utils import level_cache
+from utils.level_pack import LevelPack
+from utils.replay import Replay, state_hash, prune_replays
+from utils.profiler import profiler
 
-class Game:
-    def __init__(self):
-        # general setup
-        pygame.init()
-        self.screen = pygame.display.set_mode(DISPLAY_RESOLUTION)
-        self.clock = pygame.time.Clock()
-        self.running = True
+class Game(Scene):
+    def __init__(self, game_level=None, levels_dir="levels", level_pack=LEVEL_PACK, screen=None, clock=None):
+        # general setup, the display and clock are shared when running under a SceneManager
+        if screen is None:
+            pygame.init()
+            screen = pygame.display.set_mode(DISPLAY_RESOLUTION)
+        self.screen = screen
+        self.clock = pygame.time.Clock() if clock is None else clock
         
         # game settings
-        self.game_level = load_game_level()
+        self.game_level = load_game_level() if game_level is None else game_level
+        self.levels_dir = levels_dir
+        self.pack = LevelPack(level_pack) if level_pack else None
 
-        # all sprite groups
-        self.all_sprites = pygame.sprite.Group()
+        # all sprite groups, all_sprites only holds what is on screen
+        # (walls are baked into the static layer instead)
+        self.all_sprites = pygame.sprite.LayeredDirty()
         self.box_sprites = pygame.sprite.Group()
-        self.collision_sprites = pygame.sprite.Group()
         
-        # box marker points
-        self.box_marker_points = []
+        # boxes by cell index
+        self.boxes = {}
+        
+        # background and visible walls, rendered again only when the camera moves
+        self.static_surface = pygame.Surface(DISPLAY_RESOLUTION)
+        self.full_redraw = True
+        self.map_loaded = False
+        
+        # replay of the level being played
+        self.recording = None
+        self.frame = 0
+        
+        # frame profiler, F3 toggles the overlay
+        self.hud_font = assets.font(os.path.join("assets", "fonts", "font.ttf"), 12)
+        if PROFILER_TRACE_PATH and profiler.trace is None:
+            profiler.start_trace(PROFILER_TRACE_PATH)
+        
+        # decode game assets once, up front
+        assets.preload(
+            images=[
+                (os.path.join("assets", "images", "game_bg.jpg"), DISPLAY_RESOLUTION, "opaque"),
+                (os.path.join("assets", "images", "player.png"), None, "alpha"),
+                (os.path.join("assets", "graphics", "box-dark.png"), None, "alpha"),
+            ],
+        )
         
         # restart stuff
         self.restart_btn = Button(
-            image=pygame.image.load(os.path.join("assets", "button", "RestartRect.png")).convert_alpha(),
+            image=assets.image(os.path.join("assets", "button", "RestartRect.png")),
             pos=(WIDTH - 120, 30),
             text_input="Restart",
-            font=pygame.font.Font(os.path.join("assets", "fonts", "font.ttf"), 20),
+            font=assets.font(os.path.join("assets", "fonts", "font.ttf"), 20),
             base_color="#d7fcd4",
             hovering_color="white",
         )
         
-        self.setup_map()
+        # a level that fails to load is dealt with by enter, once there is a scene to move on to
+        try:
+            self.setup_map()
+        except ValueError:
+            self.unload_map()
         
     def unload_map(self):
         self.all_sprites.empty()
         self.box_sprites.empty()
-        self.collision_sprites.empty()
-        self.box_marker_points.clear()
-        
-    def display_text(self, text, size, color, position):
-        self.screen.fill("black")
-        font = pygame.font.Font(os.path.join("assets", "fonts", "font.ttf"), size)
-        text = font.render(text, True, color)
-        text_rect = text.get_rect(center=position)
-        self.screen.blit(text, text_rect)
-        pygame.display.update()
+        self.boxes.clear()
+        self.map_loaded = False
 
-    def setup_map(self):
-        if not os.path.exists(os.path.join("levels", f"{self.game_level}_level.tmx")):
+    def enter(self, level=None):
+        # the scene is reused, a new level is only loaded when the saved one moved on
+        level = load_game_level() if level is None else level
+        if level != self.game_level or not self.map_loaded:
+            self.game_level = level
             self.unload_map()
+            try:
+                loaded = self.setup_map()
+            except ValueError:
+                # a broken pack level is skipped instead of taking the game down
+                save_game(level + 1)
+                self.start_transition(f"Level {level} can't be played, skipping it", self.finish_level)
+                return
+            if not loaded:
+                save_game(1) # reset to level 1
+                self.start_transition("You have completed all levels!", self.finish_all_levels)
+                return
+        self.full_redraw = True
 
-            # levels completed screen
-            self.display_text("You have completed all levels!", 32, "White", (WIDTH // 2, HEIGHT // 2))
-            save_game(1) # reset to level 1
-            
-            time.sleep(2) # wait for player to read message
-            self.running = False
-            pygame.quit()
-            sys.exit()
+    def leave(self):
+        # keep a replay of an unfinished session
+        self.save_recording()
+
+    def can_idle(self):
+        return not profiler.hud_visible
+
+    def start_transition(self, message, on_finish):
+        # the transition scene fades out from the last frame drawn here
+        self.manager.switch("transition", message, on_finish)
+        self.unload_map()
+
+    def finish_level(self):
+        self.manager.home()
+
+    def finish_all_levels(self):
+        self.manager.stop()
+
+    def tile_image(self, level, gid):
+        path, index, columns, tile_width, tile_height = level.tileset_for(gid)
+        return assets.tile(path, index, columns, (tile_width, tile_height))
+
+    def replay(self, moves):
+        # apply LURD moves through the normal movement rules
+        for move in moves:
+            self.player.apply(move.lower())
+
+    def record_action(self, action):
+        if self.recording is not None:
+            self.recording.record(self.frame, action)
+
+    def save_recording(self):
+        if self.recording is not None and self.recording.actions:
+            self.recording.final_hash = state_hash(self.grid, self.grid.cell_at(self.player.hitbox_rect.center))
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            self.recording.save(os.path.join(REPLAY_DIR, f"{self.game_level}_level-{time.time_ns()}.rpl"))
+            prune_replays(REPLAY_DIR, REPLAY_KEEP)
+        self.recording = None
+
+    def restart(self):
+        self.record_action("x")
+        player_position, boxes = self.snapshot
+        self.grid.restore(cell for box, cell in boxes)
+        self.boxes.clear()
+        for box, cell in boxes:
+            box.place(cell)
+            self.boxes[cell] = box
+        self.player.place(player_position)
+        self.select_box(None)
+        self.refresh_view(force=True)
+
+    def select_box(self, box):
+        # the selected box is drawn highlighted until it is pushed or the selection is dropped
+        if self.selected_box is not None:
+            self.selected_box.set_selected(False)
+        self.selected_box = box
+        if box is not None:
+            box.set_selected(True)
+
+    def click(self, position):
+        # click-to-move: walk to a free cell, or click a box and then where it should go
+        x, y = self.camera.to_world(position)
+        if not (0 <= x < self.grid.width * self.grid.tile_size and 0 <= y < self.grid.height * self.grid.tile_size):
+            self.select_box(None)
+            return
+        cell = self.grid.cell_at((x, y))
+        player = self.grid.cell_at(self.player.hitbox_rect.center)
+
+        box = self.boxes.get(cell)
+        if box is not None:
+            self.select_box(None if box is self.selected_box else box)
+            return
+
+        if self.selected_box is not None:
+            moves = push_path(self.grid, player, self.selected_box.cell, cell, PUSH_SEARCH_LIMIT)
+            self.select_box(None)
+        else:
+            moves = self.reachability.walk(player, cell)
+
+        # the whole path is applied at once, through the normal movement rules
+        if moves:
+            self.replay(moves)
+
+    def refresh_view(self, force=False):
+        # follow the player, on scroll re-bake the static layer and re-cull the sprites
+        if not self.camera.follow(self.player.hitbox_rect.center) and not force:
+            return
+
+        self.static_surface.blit(assets.image(os.path.join("assets", "images", "game_bg.jpg"), DISPLAY_RESOLUTION, "opaque"), (0, 0))
+        self.camera.draw(self.static_surface)
+        self.all_sprites.clear(self.screen, self.static_surface)
+
+        self.all_sprites.empty()
+        self.all_sprites.add(self.player)
+        for cell in self.camera.visible_cells():
+            box = self.boxes.get(cell)
+            if box is not None:
+                self.all_sprites.add(box)
+        for sprite in self.all_sprites:
+            sprite.update_rect()
+        self.full_redraw = True
+
+    def level_path(self, level):
+        if self.pack is not None:
+            return f"{self.pack.path}#{level}"
+        return os.path.join(self.levels_dir, f"{level}_level.tmx")
+
+    def load_level(self, level):
+        # compiled level, None once past the last one
+        if self.pack is not None:
+            return self.pack.compiled(level) if level <= len(self.pack) else None
+        
+        # usually already decoded by the prefetch thread
+        level_path = self.level_path(level)
+        return level_cache.get_level(level_path) if os.path.exists(level_path) else None
+
+    def dead_squares(self):
+        # .tmx levels use the analysis cached next to them, pack levels are analysed on load
+        if self.pack is None:
+            maps = analysis.load_analysis(self.level_path(self.game_level))
+        else:
+            maps = analysis.analyse(self.grid)
+        return analysis.dead_cells(maps)
+
+    @profiler.profiled("setup_map")
+    def setup_map(self):
+        # returns False once every level has been played
+        level = self.load_level(self.game_level)
+        if level is None:
+            return False
             
-        tmx_data = load_pygame(os.path.join("levels", f"{self.game_level}_level.tmx"))
-        
-        # spawn player
-        for obj in tmx_data.get_layer_by_name("BoxMarkers"):
-            if obj.name == "player":
-                self.player = Player((obj.x, obj.y), self.all_sprites, self.collision_sprites, self.box_sprites)
-            elif obj.name == "box_point":
-                self.box_marker_points.append((obj.x, obj.y))
-        
-        # spawn collision boxes
-        for x,y,image in tmx_data.get_layer_by_name("Collisions").tiles():
-            CollisionBox(
-                (x * 64, y * 64),
-                image,
-                (self.all_sprites, self.collision_sprites)
-            )
+        # level grid used for all movement checks
+        self.grid = level.make_grid()
+        if HIGHLIGHT_DEAD_SQUARES:
+            self.grid.dead = self.dead_squares()
+        
+        # camera over the level, walls are drawn per chunk
+        self.camera = Camera(self.grid, DISPLAY_RESOLUTION)
+        for cell, gid in level.tiles(level.wall_gids):
+            self.camera.add_tile(cell, self.tile_image(level, gid))
+        
+        # cached walkable region for click-to-move
+        self.reachability = Reachability(self.grid)
+        self.selected_box = None
+        
+        # spawn player (box markers are goals in the grid)
+        self.player = Player(level.player_position, self.all_sprites, self.grid, self.boxes, self.camera)
             
         # spawn boxes
-        for x,y,image in tmx_data.get_layer_by_name("Boxes").tiles():
-            Box(
-                (x * 64, y * 64),
-                image,
-                self.box_marker_points,
-                self.player,
-                self.collision_sprites,
-                self.box_sprites,
-                (self.all_sprites, self.box_sprites)
+        for cell, gid in level.tiles(level.box_gids):
+            box = Box(
+                self.grid.position_of(cell),
+                self.tile_image(level, gid),
+                self.grid,
+                self.camera,
+                self.box_sprites
             )
+            self.boxes[box.cell] = box
             
-    def run(self):
-        while self.running:
-            # delta time
-            dt = self.clock.tick(FPS) / 1000
+        # record this session, including any resumed moves
+        if RECORD_REPLAYS:
+            self.recording = Replay(self.level_path(self.game_level))
+            self.player.on_action = self.record_action
+        
+        # initial state, restored by restart without touching the disk
+        self.snapshot = (self.player.hitbox_rect.center, [(box, box.cell) for box in self.boxes.values()])
+            
+        # resume an unfinished attempt at this level
+        self.replay(saves.get_in_progress(self.game_level) or "")
+        self.saved_version = self.player.moves.version
+        self.refresh_view(force=True)
+            
+        # decode the next level while this one is played
+        if self.pack is not None:
+            self.pack.prefetch(self.game_level + 1)
+        else:
+            level_cache.prefetch(self.level_path(self.game_level + 1))
+        self.map_loaded = True
+        return True
             
-            # mouse position
-            mouse_position = pygame.mouse.get_pos()
+    def run(self):
+        # play on its own, without the menus
+        manager = SceneManager(self.screen, self.clock)
+        manager.add("game", self)
+        manager.add("transition", TransitionScene(self.screen))
+        manager.run("game", self.game_level)
+
+    def tick(self, dt, events):
+        self.frame += 1
+        profiler.frame_start()
+        
+        # mouse position
+        mouse_position = pygame.mouse.get_pos()
 
-            # event loop
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
+        # event loop
+        with profiler.span("events"):
+            for event in events:
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_F3:
+                        profiler.toggle_hud()
+                        self.full_redraw = True
+                    else:
+                        self.player.queue_key(event.key)
                     
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if self.restart_btn.checkForInput(mouse_position):
-                        self.running = False
+                        self.restart()
+                    elif event.button == 1:
+                        self.click(event.pos)
 
-            # update
-            self.all_sprites.update(dt)
+        # update, only needed while input is queued, boxes only change through pushes
+        with profiler.span("update"):
+            if self.player.actions:
+                self.player.update(dt)
+            self.refresh_view()
+        
+        # remember progress so the level can be resumed, written in the background
+        moved = self.player.moves.version != self.saved_version
+        if moved:
+            self.saved_version = self.player.moves.version
+            saves.set_in_progress(self.game_level, self.player.moves.packed())
 
-            # draw
-            game_bg = pygame.image.load(os.path.join("assets", "images", "game_bg.jpg")).convert()
-            game_bg = pygame.transform.scale(game_bg, DISPLAY_RESOLUTION)
-            self.screen.blit(game_bg, (0, 0))
-            self.all_sprites.draw(self.screen)
-            
-            # restart button
-            
-            self.restart_btn.changeColor(mouse_position)
-            self.restart_btn.update(self.screen)
+        # draw, only sprites that moved are redrawn over the static layer
+        with profiler.span("draw"):
+            full_redraw = self.full_redraw or not DIRTY_RENDERING
+            if full_redraw:
+                self.all_sprites.repaint_rect(self.screen.get_rect())
+            dirty_rects = self.all_sprites.draw(self.screen)
             
-            # check level completion
-            if self.player.level_completed:
-                self.unload_map()
+            # restart button, redrawn only when its hover state changes
+            if self.restart_btn.changeColor(mouse_position) or full_redraw:
+                self.screen.blit(self.static_surface, self.restart_btn.rect, self.restart_btn.rect)
+                self.restart_btn.update(self.screen)
+                dirty_rects.append(self.restart_btn.rect)
                 
-                # game over screen
-                self.display_text("Level Completed!", 32, "White", (WIDTH // 2, HEIGHT // 2))
+            # profiler overlay
+            if profiler.hud_visible:
+                dirty_rects.extend(profiler.draw_hud(self.screen, self.hud_font, self.clock.get_fps(), self.static_surface))
+        
+        # update screen
+        with profiler.span("display.update"):
+            if full_redraw:
+                pygame.display.update()
+            else:
+                pygame.display.update(dirty_rects)
+        self.full_redraw = False
+        profiler.frame_end()
+        
+        # check level completion
+        if self.player.level_completed:
+            # game over screen, the save overlaps with it and the next level was prefetched on load
+            self.save_recording()
+            self.start_transition("Level Completed!", self.finish_level)
 
-                # increment level
-                save_game(self.game_level + 1)
-                
-                time.sleep(2) # wait for player to read message
-                self.running = False
+            # increment level
+            saves.record_best(self.game_level, len(self.player.moves), self.player.moves.pushes)
+            saves.set_in_progress(self.game_level, None)
+            save_game(self.game_level + 1)
 
-            # update screen
-            pygame.display.update()
+        return bool(moved or dirty_rects or full_redraw or self.player.actions)
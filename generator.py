@@ -0,0 +1,185 @@
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from grid import DIRECTIONS, MOVE_NAMES, LevelGrid, WALL, FLOOR
+from pathfinding import flood, walk_path
+from solver import Solver
+from utils.tmx_writer import write_level
+
+
+def carve_rooms(width, height, rng, floor_ratio):
+    # grow one connected area of small rooms and corridors, each overlapping what is already carved
+    grid = LevelGrid(width, height)
+    grid.tiles[:] = bytes([WALL]) * (width * height)
+    interior = (width - 2) * (height - 2)
+
+    floor = [grid.index(rng.randrange(1, width - 1), rng.randrange(1, height - 1))]
+    grid.tiles[floor[0]] = FLOOR
+    while len(floor) < interior * floor_ratio:
+        x, y = grid.coords(rng.choice(floor))
+        if rng.random() < 0.5:
+            # a corridor one tile wide
+            length = rng.randint(2, 5)
+            room_width, room_height = (length, 1) if rng.random() < 0.5 else (1, length)
+        else:
+            room_width, room_height = rng.randint(2, 3), rng.randint(2, 3)
+        left = min(max(x - rng.randrange(room_width), 1), width - 1 - room_width)
+        top = min(max(y - rng.randrange(room_height), 1), height - 1 - room_height)
+        for cy in range(top, top + room_height):
+            for cx in range(left, left + room_width):
+                cell = grid.index(cx, cy)
+                if grid.tiles[cell] == WALL:
+                    grid.tiles[cell] = FLOOR
+                    floor.append(cell)
+    return grid, floor
+
+
+def reverse_pulls(grid, player, rng, pulls):
+    # start solved and pull boxes off their goals, every pull is a push played backwards
+    # so the resulting level is always solvable; returns (player, [(box cell, push move)])
+    boxes = set(grid.goals)
+    history = []
+    last_box = None
+    for _ in range(pulls):
+        region = flood(grid, player, boxes)
+        candidates = []
+        for box in boxes:
+            for dx, dy in DIRECTIONS.values():
+                stand = grid.neighbour(box, dx, dy)
+                back = grid.neighbour(stand, dx, dy) if stand is not None else None
+                if stand in region and not grid.is_wall(back) and back not in boxes:
+                    candidates.append((box, dx, dy))
+        if not candidates:
+            break
+
+        # keep pulling the same box most of the time for longer box paths
+        same = [candidate for candidate in candidates if candidate[0] == last_box]
+        box, dx, dy = rng.choice(same if same and rng.random() < 0.7 else candidates)
+        stand = grid.neighbour(box, dx, dy)
+        boxes.remove(box)
+        boxes.add(stand)
+        player = grid.neighbour(stand, dx, dy)
+        history.append((stand, MOVE_NAMES[(-dx, -dy)]))
+        last_box = stand
+
+    grid.restore(boxes)
+    player = rng.choice(sorted(flood(grid, player, boxes)))
+    return player, history
+
+
+def forward_solution(solver, player, history):
+    # undo the pulls in reverse order as pushes, walking to each push in between
+    boxes = set(solver.grid.boxes)
+    moves = []
+    for box, move in reversed(history):
+        dx, dy = DIRECTIONS[move]
+        moves.append(walk_path(solver.grid, player, solver.grid.neighbour(box, -dx, -dy), boxes))
+        moves.append(move.upper())
+        boxes.remove(box)
+        boxes.add(solver.grid.neighbour(box, dx, dy))
+        player = box
+    return "".join(moves)
+
+
+def difficulty(pushes, nodes):
+    # optimal pushes, weighted by how much searching it took to find them
+    return round(pushes * (1 + math.log2(1 + nodes) / 8), 1)
+
+
+def generate_level(job):
+    path, solution_path, seed, width, height, box_count, pulls, max_nodes, min_pushes, max_attempts = job
+    start_time = time.perf_counter()
+    rng = random.Random(seed)
+
+    for attempt in range(1, max_attempts + 1):
+        grid, floor = carve_rooms(width, height, rng, 0.4)
+        if len(floor) < box_count * 3:
+            continue
+        grid.goals.update(rng.sample(floor, box_count))
+        player, history = reverse_pulls(grid, rng.choice([cell for cell in floor if cell not in grid.goals]), rng, pulls)
+        if grid.boxes_on_goals == box_count:
+            continue
+        grid.player_start = player
+
+        # score with a push-optimal solve, falling back to the construction when over budget
+        solver = Solver(grid, max_nodes)
+        result = solver.solve()
+        if result.solved:
+            moves, pushes, status = result.moves, result.pushes, "optimal"
+        else:
+            moves, pushes, status = forward_solution(solver, player, history), len(history), "constructed"
+        if pushes < min_pushes:
+            continue
+
+        write_level(path, grid)
+        if solution_path is not None:
+            with open(solution_path, "w") as f:
+                f.write(moves + "\n")
+        score = difficulty(pushes, result.nodes)
+        return path, True, pushes, score, status, attempt, time.perf_counter() - start_time
+
+    return path, False, 0, 0.0, "no level", max_attempts, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate solvable levels by pulling boxes backwards from their goals.")
+    parser.add_argument("count", type=int, help="number of levels to generate")
+    parser.add_argument("--output", default="generated", help="directory for the .tmx levels")
+    parser.add_argument("--solutions", default=None, help="directory for .lurd solutions (default: OUTPUT/solutions)")
+    parser.add_argument("--start", type=int, default=1, help="number of the first level, files are named N_level.tmx")
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--height", type=int, default=12)
+    parser.add_argument("--boxes", type=int, default=4)
+    parser.add_argument("--pulls", type=int, default=60, help="reverse pulls tried per level")
+    parser.add_argument("--min-pushes", type=int, default=8, help="reject levels solved in fewer pushes")
+    parser.add_argument("--max-nodes", type=int, default=20000, help="solver budget used for scoring")
+    parser.add_argument("--attempts", type=int, default=50, help="layouts tried per level before giving up")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: cpu count)")
+    args = parser.parse_args()
+
+    solutions_dir = args.solutions or os.path.join(args.output, "solutions")
+    os.makedirs(args.output, exist_ok=True)
+    os.makedirs(solutions_dir, exist_ok=True)
+
+    # every level gets its own seed so a run is reproducible whatever the worker count
+    seed = random.randrange(2 ** 32) if args.seed is None else args.seed
+    jobs = []
+    for number in range(args.start, args.start + args.count):
+        jobs.append((
+            os.path.join(args.output, f"{number}_level.tmx"),
+            os.path.join(solutions_dir, f"{number}_level.lurd"),
+            seed * 1_000_003 + number,
+            args.width, args.height, args.boxes, args.pulls, args.max_nodes, args.min_pushes, args.attempts,
+        ))
+
+    workers = args.workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (4 * workers))
+
+    start_time = time.perf_counter()
+    scores = {}
+    with ProcessPoolExecutor(workers) as pool:
+        for path, generated, pushes, score, status, attempts, elapsed in pool.map(generate_level, jobs, chunksize=chunksize):
+            if generated:
+                scores[os.path.basename(path)] = {"pushes": pushes, "difficulty": score, "solution": status}
+            print(f"{path}: {status} pushes={pushes} difficulty={score} attempts={attempts} time={elapsed:.2f}s")
+    elapsed = time.perf_counter() - start_time
+
+    # merge with scores from earlier runs into the same directory
+    scores_path = os.path.join(args.output, "difficulty.json")
+    if os.path.exists(scores_path):
+        with open(scores_path) as f:
+            scores = {**json.load(f), **scores}
+    with open(scores_path, "w") as f:
+        json.dump(scores, f, indent=2, sort_keys=True)
+
+    print(f"{len(jobs)} levels in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} levels/s, seed {seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import base64
+import gzip
+import zlib
+import xml.etree.ElementTree as ElementTree
+
+FLOOR = 0
+WALL = 1
+
+# LURD notation used by solution files and the solver
+DIRECTIONS = {
+    "l": (-1, 0),
+    "u": (0, -1),
+    "r": (1, 0),
+    "d": (0, 1),
+}
+MOVE_NAMES = {direction: name for name, direction in DIRECTIONS.items()}
+MOVE_ORDER = "lurd"
+
+# move log byte: direction index in the low bits, pushed flag above it
+PUSH_FLAG = 4
+
+
+class LevelGrid:
+    def __init__(self, width, height, tile_size=64):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+
+        # one byte per cell, indexed by y * width + x
+        self.tiles = bytearray(width * height)
+        self.boxes = set()
+        self.goals = set()
+        self.boxes_on_goals = 0
+        self.player_start = None
+
+        # cells a box can never be pushed to a goal from, filled in from analysis.py
+        self.dead = frozenset()
+
+        # bumped whenever a box moves, lets callers cache anything that depends on box positions
+        self.box_version = 0
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def coords(self, cell):
+        return cell % self.width, cell // self.width
+
+    def cell_at(self, position):
+        # pixel position -> cell index
+        return self.index(int(position[0] // self.tile_size), int(position[1] // self.tile_size))
+
+    def position_of(self, cell):
+        # cell index -> pixel topleft
+        x, y = self.coords(cell)
+        return x * self.tile_size, y * self.tile_size
+
+    def neighbour(self, cell, dx, dy):
+        x, y = self.coords(cell)
+        x, y = x + dx, y + dy
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.index(x, y)
+        return None
+
+    def is_wall(self, cell):
+        # anything off the map counts as a wall
+        return cell is None or self.tiles[cell] == WALL
+
+    def is_free(self, cell):
+        return not self.is_wall(cell) and cell not in self.boxes
+
+    def can_move(self, cell, dx, dy):
+        target = self.neighbour(cell, dx, dy)
+        if self.is_wall(target):
+            return False
+
+        # a box can only be pushed onto a free cell
+        if target in self.boxes:
+            return self.is_free(self.neighbour(target, dx, dy))
+
+        return True
+
+    @property
+    def solved(self):
+        return self.boxes_on_goals == len(self.goals)
+
+    def restore(self, boxes):
+        # reset box positions, e.g. from a restart snapshot
+        self.boxes.clear()
+        self.boxes.update(boxes)
+        self.boxes_on_goals = len(self.boxes & self.goals)
+        self.box_version += 1
+
+    def move_box(self, source, target):
+        self.boxes.remove(source)
+        self.boxes.add(target)
+
+        # keep the goal count in step with the push
+        self.boxes_on_goals += (target in self.goals) - (source in self.goals)
+        self.box_version += 1
+
+    def step(self, cell, dx, dy):
+        # apply one move, returns (new cell, pushed) or None if blocked
+        if not self.can_move(cell, dx, dy):
+            return None
+
+        target = self.neighbour(cell, dx, dy)
+        pushed = target in self.boxes
+        if pushed:
+            self.move_box(target, self.neighbour(target, dx, dy))
+        return target, pushed
+
+    def unstep(self, cell, dx, dy, pushed):
+        # undo a move that ended on cell, returns the previous cell
+        previous = self.neighbour(cell, -dx, -dy)
+        if pushed:
+            self.move_box(self.neighbour(cell, dx, dy), cell)
+        return previous
+
+
+class MoveLog:
+    def __init__(self):
+        # one byte per move, entries past position are the redo stack
+        self.steps = bytearray()
+        self.position = 0
+        self.pushes = 0
+        self.version = 0
+
+    def __len__(self):
+        return self.position
+
+    def record(self, move, pushed):
+        del self.steps[self.position:]
+        self.steps.append(MOVE_ORDER.index(move) | (PUSH_FLAG if pushed else 0))
+        self.position += 1
+        self.pushes += pushed
+        self.version += 1
+
+    def undo(self):
+        # (move, pushed) of the step to take back, or None
+        if self.position == 0:
+            return None
+        self.position -= 1
+        return self.decode(self.steps[self.position], -1)
+
+    def redo(self):
+        if self.position == len(self.steps):
+            return None
+        self.position += 1
+        return self.decode(self.steps[self.position - 1], 1)
+
+    def decode(self, step, change):
+        pushed = bool(step & PUSH_FLAG)
+        self.pushes += change * pushed
+        self.version += 1
+        return MOVE_ORDER[step & 3], pushed
+
+    def clear(self):
+        del self.steps[:]
+        self.position = 0
+        self.pushes = 0
+        self.version += 1
+
+    def packed(self):
+        # the played steps as bytes, cheap enough to take after every move
+        return bytes(memoryview(self.steps)[:self.position])
+
+    def lurd(self):
+        return steps_to_lurd(self.steps[:self.position])
+
+
+def steps_to_lurd(steps):
+    # move log bytes -> LURD string, uppercase for pushes
+    return "".join(
+        MOVE_ORDER[step & 3].upper() if step & PUSH_FLAG else MOVE_ORDER[step & 3]
+        for step in steps
+    )
+
+
+
+def read_layer_data(layer):
+    # gids of a tile layer in row order, flip flags stripped
+    data = layer.find("data")
+    encoding = data.get("encoding")
+    if encoding == "csv":
+        gids = [int(value) for value in data.text.replace("\n", "").split(",") if value.strip()]
+    elif encoding == "base64":
+        raw = base64.b64decode(data.text.strip())
+        if data.get("compression") == "zlib":
+            raw = zlib.decompress(raw)
+        elif data.get("compression") == "gzip":
+            raw = gzip.decompress(raw)
+        gids = [int.from_bytes(raw[i:i + 4], "little") for i in range(0, len(raw), 4)]
+    else:
+        gids = [int(tile.get("gid", 0)) for tile in data.iter("tile")]
+    return [gid & 0x0FFFFFFF for gid in gids]
+
+
+def read_tmx(path):
+    # map element, Collisions/Boxes gids by layer name and (name, position) of every BoxMarkers object
+    root = ElementTree.parse(path).getroot()
+    layers = {
+        layer.get("name"): read_layer_data(layer)
+        for layer in root.iter("layer")
+        if layer.get("name") in ("Collisions", "Boxes")
+    }
+    markers = [
+        (obj.get("name"), (float(obj.get("x")), float(obj.get("y"))))
+        for group in root.iter("objectgroup")
+        if group.get("name") == "BoxMarkers"
+        for obj in group.iter("object")
+    ]
+    return root, layers, markers
+
+
+def load_level(path):
+    # parse a level straight from the TMX xml, so headless tools never import pygame
+    root, layers, markers = read_tmx(path)
+    grid = LevelGrid(int(root.get("width")), int(root.get("height")), int(root.get("tilewidth")))
+
+    for cell, gid in enumerate(layers.get("Collisions", ())):
+        if gid:
+            grid.tiles[cell] = WALL
+    grid.boxes.update(cell for cell, gid in enumerate(layers.get("Boxes", ())) if gid)
+
+    for name, position in markers:
+        if name == "player":
+            grid.player_start = grid.cell_at(position)
+        elif name == "box_point":
+            grid.goals.add(grid.cell_at(position))
+
+    grid.boxes_on_goals = len(grid.boxes & grid.goals)
+    return grid
@@ -3,85 +3,122 @@ import pygame, sys, os
 from settings import DISPLAY_RESOLUTION
 from utils.button import Button
 from utils.save_game import load_game_level
+from utils.assets import assets
 from game import Game
+from scenes import Scene, SceneManager, TransitionScene
 
 pygame.init()
 
 SCREEN = pygame.display.set_mode(DISPLAY_RESOLUTION)
+CLOCK = pygame.time.Clock()
 pygame.display.set_caption("Sokoban Deluxe")
 
-BG = pygame.image.load(os.path.join("assets", "images", "Background.png"))
-BG = pygame.transform.scale(BG, DISPLAY_RESOLUTION)
+BG = assets.image(os.path.join("assets", "images", "Background.png"), DISPLAY_RESOLUTION, "opaque")
 
 def get_font(size): # Returns Press-Start-2P in the desired size
-    return pygame.font.Font(os.path.join("assets", "fonts", "font.ttf"), size)
-
-def play():
-    Game().run()
-    
-def options():
-    while True:
+    return assets.font(os.path.join("assets", "fonts", "font.ttf"), size)
+
+# decode menu assets once, up front
+assets.preload(
+    images=[
+        (os.path.join("assets", "button", "PlayRect.png"), None, "alpha"),
+        (os.path.join("assets", "button", "OptionsRect.png"), None, "alpha"),
+        (os.path.join("assets", "button", "QuitRect.png"), None, "alpha"),
+    ],
+    fonts=[(os.path.join("assets", "fonts", "font.ttf"), size) for size in (24, 45, 74, 75)],
+)
+
+# menu widgets, built once and redrawn only when something changes
+MENU_TEXT = get_font(74).render("Sokoban Deluxe", True, "#b68f40")
+MENU_RECT = MENU_TEXT.get_rect(center=(640, 100))
+
+PLAY_BUTTON = Button(image=assets.image(os.path.join("assets", "button", "PlayRect.png")), pos=(640, 250), 
+                    text_input="PLAY", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
+OPTIONS_BUTTON = Button(image=assets.image(os.path.join("assets", "button", "OptionsRect.png")), pos=(640, 400), 
+                    text_input="OPTIONS", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
+QUIT_BUTTON = Button(image=assets.image(os.path.join("assets", "button", "QuitRect.png")), pos=(640, 550), 
+                    text_input="QUIT", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
+
+OPTIONS_TEXT = get_font(45).render("This is the OPTIONS screen.", True, "Black")
+OPTIONS_RECT = OPTIONS_TEXT.get_rect(center=(640, 260))
+
+OPTIONS_BACK = Button(image=None, pos=(640, 460), 
+                    text_input="BACK", font=get_font(75), base_color="Black", hovering_color="Green")
+
+class OptionsMenu(Scene):
+    def enter(self):
+        self.redraw = True
+
+    def tick(self, dt, events):
         OPTIONS_MOUSE_POS = pygame.mouse.get_pos()
 
-        SCREEN.fill("white")
-
-        OPTIONS_TEXT = get_font(45).render("This is the OPTIONS screen.", True, "Black")
-        OPTIONS_RECT = OPTIONS_TEXT.get_rect(center=(640, 260))
-        SCREEN.blit(OPTIONS_TEXT, OPTIONS_RECT)
-
-        OPTIONS_BACK = Button(image=None, pos=(640, 460), 
-                            text_input="BACK", font=get_font(75), base_color="Black", hovering_color="Green")
-
-        OPTIONS_BACK.changeColor(OPTIONS_MOUSE_POS)
-        OPTIONS_BACK.update(SCREEN)
+        if OPTIONS_BACK.changeColor(OPTIONS_MOUSE_POS):
+            self.redraw = True
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+        for event in events:
+            if event.type == pygame.WINDOWEXPOSED:
+                self.redraw = True
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if OPTIONS_BACK.checkForInput(OPTIONS_MOUSE_POS):
-                    main_menu()
+                    self.manager.switch("menu")
+                    return True
 
+        if not self.redraw:
+            return False
+        SCREEN.fill("white")
+        SCREEN.blit(OPTIONS_TEXT, OPTIONS_RECT)
+        OPTIONS_BACK.update(SCREEN)
         pygame.display.update()
+        self.redraw = False
+        return True
+
+class MainMenu(Scene):
+    def enter(self):
+        self.redraw = True
 
-def main_menu():
-    while True:
+    def tick(self, dt, events):
         game_level = load_game_level()
-        
-        SCREEN.blit(BG, (0, 0))
+        if PLAY_BUTTON.text_input != f"PLAY Level {game_level}":
+            PLAY_BUTTON.setText(f"PLAY Level {game_level}")
+            self.redraw = True
 
         MENU_MOUSE_POS = pygame.mouse.get_pos()
 
-        MENU_TEXT = get_font(74).render("Sokoban Deluxe", True, "#b68f40")
-        MENU_RECT = MENU_TEXT.get_rect(center=(640, 100))
-
-        PLAY_BUTTON = Button(image=pygame.image.load(os.path.join("assets", "button", "PlayRect.png")), pos=(640, 250), 
-                            text_input=f"PLAY Level {game_level}", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
-        OPTIONS_BUTTON = Button(image=pygame.image.load(os.path.join("assets", "button", "OptionsRect.png")), pos=(640, 400), 
-                            text_input="OPTIONS", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
-        QUIT_BUTTON = Button(image=pygame.image.load(os.path.join("assets", "button", "QuitRect.png")), pos=(640, 550), 
-                            text_input="QUIT", font=get_font(24), base_color="#d7fcd4", hovering_color="White")
-
-        SCREEN.blit(MENU_TEXT, MENU_RECT)
-
         for button in [PLAY_BUTTON, OPTIONS_BUTTON, QUIT_BUTTON]:
-            button.changeColor(MENU_MOUSE_POS)
-            button.update(SCREEN)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+            if button.changeColor(MENU_MOUSE_POS):
+                self.redraw = True
+
+        for event in events:
+            if event.type == pygame.WINDOWEXPOSED:
+                self.redraw = True
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if PLAY_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    play()
+                    self.manager.switch("game")
+                    return True
                 if OPTIONS_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    options()
+                    self.manager.switch("options")
+                    return True
                 if QUIT_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    pygame.quit()
-                    sys.exit()
+                    self.manager.stop()
+                    return True
 
+        if not self.redraw:
+            return False
+        SCREEN.blit(BG, (0, 0))
+        SCREEN.blit(MENU_TEXT, MENU_RECT)
+        for button in [PLAY_BUTTON, OPTIONS_BUTTON, QUIT_BUTTON]:
+            button.update(SCREEN)
         pygame.display.update()
-
-main_menu()
\ No newline at end of file
+        self.redraw = False
+        return True
+
+# every scene is created once and reused, switching between them never recurses
+SCENES = SceneManager(SCREEN, CLOCK, home="menu")
+SCENES.add("menu", MainMenu())
+SCENES.add("options", OptionsMenu())
+SCENES.add("game", Game(screen=SCREEN, clock=CLOCK))
+SCENES.add("transition", TransitionScene(SCREEN))
+SCENES.run("menu")
+
+pygame.quit()
+sys.exit()
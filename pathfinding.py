@@ -0,0 +1,173 @@
+from collections import deque
+
+from grid import DIRECTIONS
+
+
+def flood(grid, start, blocked):
+    # every cell the player can walk to from start without pushing
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for dx, dy in DIRECTIONS.values():
+            target = grid.neighbour(cell, dx, dy)
+            if target not in seen and not grid.is_wall(target) and target not in blocked:
+                seen.add(target)
+                queue.append(target)
+    return seen
+
+
+def walk_path(grid, start, end, blocked):
+    # shortest walk as lowercase LURD moves, None if end can't be reached
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == end:
+            path = []
+            while parents[cell] is not None:
+                cell, move = parents[cell]
+                path.append(move)
+            return "".join(reversed(path))
+
+        for move, (dx, dy) in DIRECTIONS.items():
+            target = grid.neighbour(cell, dx, dy)
+            if target not in parents and not grid.is_wall(target) and target not in blocked:
+                parents[target] = (cell, move)
+                queue.append(target)
+    return None
+
+
+def open_neighbours(grid, blocked):
+    # walkable neighbours of every cell, blocked cells and walls have none and are never listed
+    neighbours = []
+    for cell in range(grid.width * grid.height):
+        if grid.is_wall(cell) or cell in blocked:
+            neighbours.append(())
+            continue
+        cells = []
+        for dx, dy in DIRECTIONS.values():
+            target = grid.neighbour(cell, dx, dy)
+            if not grid.is_wall(target) and target not in blocked:
+                cells.append(target)
+        neighbours.append(tuple(cells))
+    return neighbours
+
+
+def articulation_points(neighbours, start):
+    # cells connected to start, and those of them that split the region in two when taken out
+    order = {start: 0}
+    low = {start: 0}
+    points = set()
+    root_children = 0
+    stack = [(start, None, iter(neighbours[start]))]
+    while stack:
+        cell, parent, children = stack[-1]
+        for child in children:
+            if child == parent:
+                continue
+            if child in order:
+                low[cell] = min(low[cell], order[child])
+            else:
+                order[child] = low[child] = len(order)
+                stack.append((child, cell, iter(neighbours[child])))
+                break
+        else:
+            stack.pop()
+            if parent == start:
+                root_children += 1
+            elif parent is not None:
+                low[parent] = min(low[parent], low[cell])
+                if low[cell] >= order[parent]:
+                    points.add(parent)
+    if root_children > 1:
+        points.add(start)
+    return order, points
+
+
+def push_path(grid, player, box, target, max_states=None):
+    # fewest pushes moving one box to target with every other box left in place,
+    # returns LURD moves including the walks between pushes, or None (also once max_states is passed)
+    others = grid.boxes - {box}
+    if box == target:
+        return ""
+
+    neighbours = open_neighbours(grid, others)
+    region, cut_cells = articulation_points(neighbours, player)
+    if box not in region or target not in region:
+        return None
+
+    # player regions with the box on a cut cell, flooded once per box cell: {cell: region number}
+    split_regions = {}
+
+    def region_key(box_cell, player_cell):
+        # the box only splits the player's region when it stands on a cut cell
+        if box_cell not in cut_cells:
+            return 0
+        numbers = split_regions.setdefault(box_cell, {})
+        if player_cell not in numbers:
+            number = len(numbers) + 1
+            numbers[player_cell] = number
+            queue = deque([player_cell])
+            while queue:
+                for neighbour in neighbours[queue.popleft()]:
+                    if neighbour != box_cell and neighbour not in numbers:
+                        numbers[neighbour] = number
+                        queue.append(neighbour)
+        return numbers[player_cell]
+
+    # states are (box cell, player region) with the player's actual cell kept alongside,
+    # after a push the player stands where the box was
+    start = (box, region_key(box, player))
+    parents = {start: None}
+    players = {start: player}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        box_cell, key = state
+        if box_cell == target:
+            moves = []
+            while parents[state] is not None:
+                previous, move = parents[state]
+                dx, dy = DIRECTIONS[move]
+                behind = grid.neighbour(previous[0], -dx, -dy)
+                moves.append(move.upper())
+                moves.append(walk_path(grid, players[previous], behind, others | {previous[0]}))
+                state = previous
+            return "".join(reversed(moves))
+
+        for move, (dx, dy) in DIRECTIONS.items():
+            behind = grid.neighbour(box_cell, -dx, -dy)
+            ahead = grid.neighbour(box_cell, dx, dy)
+            if behind not in neighbours[box_cell] or ahead not in neighbours[box_cell]:
+                continue
+            if key and split_regions[box_cell].get(behind) != key:
+                continue
+            pushed = (ahead, region_key(ahead, box_cell))
+            if pushed not in parents:
+                parents[pushed] = (state, move)
+                players[pushed] = box_cell
+                queue.append(pushed)
+        if max_states is not None and len(parents) > max_states:
+            return None
+    return None
+
+
+class Reachability:
+    # the player's walkable region, only flooded again after a push changed the boxes
+    def __init__(self, grid):
+        self.grid = grid
+        self.cells = set()
+        self.box_version = None
+
+    def region(self, player):
+        if self.box_version != self.grid.box_version or player not in self.cells:
+            self.cells = flood(self.grid, player, self.grid.boxes)
+            self.box_version = self.grid.box_version
+        return self.cells
+
+    def walk(self, player, target):
+        # clicks outside the region are rejected without a search
+        if target not in self.region(player):
+            return None
+        return walk_path(self.grid, player, target, self.grid.boxes)
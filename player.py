@@ -1,20 +1,34 @@
 import pygame
 import os
+from collections import deque
 
+from settings import INPUT_QUEUE_SIZE, INPUT_DRAIN_LIMIT
+from grid import DIRECTIONS, MOVE_NAMES, MoveLog
+from utils.assets import assets
 
-class Player(pygame.sprite.Sprite):
+# key -> action: lurd moves, z undo, y redo
+KEY_ACTIONS = {
+    pygame.K_LEFT: "l", pygame.K_a: "l",
+    pygame.K_UP: "u", pygame.K_w: "u",
+    pygame.K_RIGHT: "r", pygame.K_d: "r",
+    pygame.K_DOWN: "d", pygame.K_s: "d",
+    pygame.K_z: "z", pygame.K_BACKSPACE: "z",
+    pygame.K_y: "y",
+}
+
+
+class Player(pygame.sprite.DirtySprite):
     def __init__(
         self,
         position,
         groups,
-        collision_groups: pygame.sprite.Group,
-        box_groups: pygame.sprite.Group,
+        grid,
+        boxes: dict,
+        camera,
     ):
         super().__init__(groups)
 
-        self.image = pygame.image.load(
-            os.path.join("assets", "images", "player.png")
-        ).convert_alpha()
+        self.image = assets.image(os.path.join("assets", "images", "player.png"))
         self.rect = self.image.get_frect(center=position)
         self.hitbox_rect = self.rect.inflate(-10, -10)
 
@@ -27,112 +41,123 @@ class Player(pygame.sprite.Sprite):
         self.is_moving = False
         self.target_position = None
 
-        # collision
-        self.collision_groups = collision_groups
+        # level grid (walls and box positions)
+        self.grid = grid
 
-        # boxes
-        self.box_groups = box_groups
+        # boxes by cell index
+        self.boxes = boxes
+        
+        # world -> screen mapping for drawing
+        self.camera = camera
+        
+        # moves made on this level, with undo/redo
+        self.moves = MoveLog()
+        
+        # actions from KEYDOWN events not applied yet
+        self.actions = deque()
+        
+        # called with every input action, used for replay recording
+        self.on_action = None
         
         # level completion
-        self.level_completed = None
+        self.level_completed = grid.solved
         
 
+    def queue_key(self, key):
+        # presses past the queue size are dropped, never the ones already waiting
+        action = KEY_ACTIONS.get(key)
+        if action is not None and len(self.actions) < INPUT_QUEUE_SIZE:
+            self.actions.append(action)
+
     def input(self):
-        # Only accept input if not currently moving
-        if not self.is_moving:
-            keys = pygame.key.get_just_pressed()
-            self.direction.x = int(keys[pygame.K_RIGHT] or keys[pygame.K_d]) - int(
-                keys[pygame.K_LEFT] or keys[pygame.K_a]
-            )
-            self.direction.y = int(keys[pygame.K_DOWN] or keys[pygame.K_s]) - int(
-                keys[pygame.K_UP] or keys[pygame.K_w]
-            )
-            # Don't normalize for grid movement - keep as -1, 0, or 1
-            if self.direction.x != 0:
-                self.direction.y = 0  # Prevent diagonal movement
-            elif self.direction.y != 0:
-                self.direction.x = 0
+        # apply queued actions in the order they were pressed, up to INPUT_DRAIN_LIMIT per frame
+        count = len(self.actions) if INPUT_DRAIN_LIMIT is None else min(INPUT_DRAIN_LIMIT, len(self.actions))
+        for _ in range(count):
+            if self.level_completed:
+                self.actions.clear()
+                break
+            self.apply(self.actions.popleft())
+
+    def apply(self, action):
+        self.report(action)
+        if action == "z":
+            self.undo()
+        elif action == "y":
+            self.redo()
+        else:
+            self.direction.update(DIRECTIONS[action])
+            self.move(0)
+
+    def report(self, action):
+        if self.on_action is not None:
+            self.on_action(action)
 
     def move(self, dt):
         # If there's input and not currently moving
         if (self.direction.x != 0 or self.direction.y != 0) and not self.is_moving:
-            # Calculate target grid position
-            target_x = self.hitbox_rect.x + (self.direction.x * self.grid_size)
-            target_y = self.hitbox_rect.y + (self.direction.y * self.grid_size)
-            
-            # Create target rect for collision checking
-            target_rect = pygame.Rect(target_x, target_y, self.hitbox_rect.width, self.hitbox_rect.height)
-            
             # Check if target position is free
-            if self.is_target_position_free(target_rect):
+            cell = self.grid.cell_at(self.hitbox_rect.center)
+            if self.grid.can_move(cell, int(self.direction.x), int(self.direction.y)):
                 # Store direction for box pushing
                 move_direction = pygame.math.Vector2(self.direction.x, self.direction.y)
                 
                 # Move to target position instantly
-                self.hitbox_rect.x = target_x
-                self.hitbox_rect.y = target_y
-                self.rect.center = self.hitbox_rect.center
+                self.shift(move_direction)
                 
                 # Try to push boxes if any
-                self.push_boxes(move_direction)
+                pushed = self.push_boxes(move_direction)
+                self.moves.record(MOVE_NAMES[(int(move_direction.x), int(move_direction.y))], pushed)
         
         # Reset direction after processing
         self.direction.x = 0
         self.direction.y = 0
 
-    def is_target_position_free(self, target_rect):
-        # Check collision with walls/obstacles
-        for sprite in self.collision_groups:
-            if sprite.rect.colliderect(target_rect):
-                return False
-        
-        # Check collision with boxes - if there's a box, check if it can be pushed
-        for box in self.box_groups:
-            if box.rect.colliderect(target_rect):
-                # Calculate where the box would go if pushed
-                box_target_x = box.rect.x + (self.direction.x * self.grid_size)
-                box_target_y = box.rect.y + (self.direction.y * self.grid_size)
-                box_target_rect = pygame.Rect(box_target_x, box_target_y, box.rect.width, box.rect.height)
-                
-                # Check if box can be pushed (no wall or other box in the way)
-                box_can_move = True
-                for wall in self.collision_groups:
-                    if wall.rect.colliderect(box_target_rect):
-                        box_can_move = False
-                        break
-                
-                if box_can_move:
-                    for other_box in self.box_groups:
-                        if other_box != box and other_box.rect.colliderect(box_target_rect):
-                            box_can_move = False
-                            break
-                
-                return box_can_move
-        
-        return True
-    
+    def shift(self, direction):
+        self.hitbox_rect.x += direction.x * self.grid_size
+        self.hitbox_rect.y += direction.y * self.grid_size
+        self.update_rect()
+
+    def update_rect(self):
+        # hitbox_rect is in world coordinates, rect is where the sprite is drawn
+        self.rect.center = self.camera.to_screen(self.hitbox_rect.center)
+        self.dirty = 1
+
+    def place(self, position):
+        # back to a snapshot position with an empty move log
+        self.hitbox_rect.center = position
+        self.update_rect()
+        self.moves.clear()
+        self.actions.clear()
+        self.level_completed = self.grid.solved
+
+    def undo(self):
+        step = self.moves.undo()
+        if step is not None:
+            move_direction = pygame.math.Vector2(DIRECTIONS[step[0]])
+            if step[1]:
+                # pull the box back onto the player's cell
+                box = self.boxes.pop(self.grid.cell_at(self.hitbox_rect.center + move_direction * self.grid_size))
+                box.move_with_player(-move_direction)
+                self.boxes[box.cell] = box
+                self.level_completed = self.grid.solved
+            self.shift(-move_direction)
+
+    def redo(self):
+        step = self.moves.redo()
+        if step is not None:
+            move_direction = pygame.math.Vector2(DIRECTIONS[step[0]])
+            self.shift(move_direction)
+            self.push_boxes(move_direction)
+
     def push_boxes(self, move_direction):
-        # Push any boxes that are in the player's current position
-        for box in self.box_groups:
-            if box.rect.colliderect(self.hitbox_rect):
-                # Move the box by one grid cell in the direction
-                box.rect.x += move_direction.x * self.grid_size
-                box.rect.y += move_direction.y * self.grid_size
-
-    def check_collision(self, direction):
-        for sprite in self.collision_groups:
-            if sprite.rect.colliderect(self.hitbox_rect):
-                if direction == "horizontal":
-                    if self.direction.x > 0:
-                        self.hitbox_rect.right = sprite.rect.left
-                    if self.direction.x < 0:
-                        self.hitbox_rect.left = sprite.rect.right
-                elif direction == "vertical":
-                    if self.direction.y > 0:
-                        self.hitbox_rect.bottom = sprite.rect.top
-                    if self.direction.y < 0:
-                        self.hitbox_rect.top = sprite.rect.bottom
+        # Push the box standing on the player's new cell, if any
+        box = self.boxes.pop(self.grid.cell_at(self.hitbox_rect.center), None)
+        if box is not None:
+            box.move_with_player(move_direction)
+            self.boxes[box.cell] = box
+            self.level_completed = self.grid.solved
+            return True
+        return False
 
     def update(self, dt):
         self.input()
-        self.move(dt)
@@ -0,0 +1,115 @@
+import pygame
+import os
+
+from settings import FPS, DISPLAY_RESOLUTION, WIDTH, HEIGHT, TRANSITION_TIME, IDLE_TIMEOUT, IDLE_AFTER
+from utils.assets import assets
+from utils.events import wait_events
+
+
+class Scene:
+    # one screen of the game, created once and kept alive by the SceneManager
+    manager = None
+
+    def enter(self, *args):
+        pass
+
+    def leave(self):
+        pass
+
+    def can_idle(self):
+        return True
+
+    def tick(self, dt, events):
+        # handle events, update and draw one frame, returns True if anything changed
+        return False
+
+
+class SceneManager:
+    # owns the display and clock, and runs whichever scene is current in a single loop
+    def __init__(self, screen, clock, home=None):
+        self.screen = screen
+        self.clock = clock
+        self.home_scene = home
+        self.scenes = {}
+        self.scene = None
+        self.running = False
+
+    def add(self, name, scene):
+        scene.manager = self
+        self.scenes[name] = scene
+
+    def switch(self, name, *args):
+        if self.scene is not None:
+            self.scene.leave()
+        self.scene = self.scenes[name]
+        self.scene.enter(*args)
+
+    def home(self):
+        # back to the menu, or stop when there is none
+        if self.home_scene is None:
+            self.stop()
+        else:
+            self.switch(self.home_scene)
+
+    def stop(self):
+        self.running = False
+
+    def run(self, name, *args):
+        self.running = True
+        self.switch(name, *args)
+
+        # frames in a row where nothing changed
+        idle_frames = 0
+
+        while self.running:
+            # idle: sleep until input instead of running frames that draw nothing
+            idle = IDLE_TIMEOUT is not None and idle_frames >= IDLE_AFTER and self.scene.can_idle()
+            events = wait_events(IDLE_TIMEOUT) if idle else pygame.event.get()
+            dt = self.clock.tick(FPS) / 1000
+
+            if any(event.type == pygame.QUIT for event in events):
+                self.stop()
+                break
+
+            changed = self.scene.tick(dt, events)
+            idle_frames = 0 if events or changed else idle_frames + 1
+
+        if self.scene is not None:
+            self.scene.leave()
+            self.scene = None
+
+
+class TransitionScene(Scene):
+    # fades out the last frame of the previous scene and shows a message, then calls on_finish
+    def __init__(self, screen):
+        self.screen = screen
+        self.snapshot = pygame.Surface(DISPLAY_RESOLUTION)
+        self.fade_surface = pygame.Surface(DISPLAY_RESOLUTION)
+        self.message = None
+        self.start = 0
+        self.on_finish = None
+
+    def enter(self, message, on_finish):
+        self.snapshot.blit(self.screen, (0, 0))
+        self.message = message
+        self.start = pygame.time.get_ticks()
+        self.on_finish = on_finish
+
+    def can_idle(self):
+        return False
+
+    def tick(self, dt, events):
+        progress = min(1, (pygame.time.get_ticks() - self.start) / TRANSITION_TIME)
+
+        # fade to black over the first half, then hold the message
+        self.fade_surface.set_alpha(int(255 * min(1, progress * 2)))
+        self.screen.blit(self.snapshot, (0, 0))
+        self.screen.blit(self.fade_surface, (0, 0))
+        font = assets.font(os.path.join("assets", "fonts", "font.ttf"), 32)
+        text = font.render(self.message, True, "White")
+        self.screen.blit(text, text.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
+        pygame.display.update()
+
+        if progress >= 1:
+            self.on_finish()
+        return True
@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from grid import DIRECTIONS, MOVE_ORDER
+from utils.level_pack import open_level
+
+# protocol, one command per line, one reply line per command:
+#   NEW <level>             -> OK <session> <player> <box,box,...>
+#   MOVE <session> <lurd>   -> OK <applied> <player> <solved> <from>:<to> ...  (boxes moved by the batch)
+#   STATE <session>         -> OK <player> <solved> <box,box,...>
+#   RESET <session>         -> OK <player> <solved> <box,box,...>
+#   CLOSE <session>         -> OK
+# errors reply ERR <reason>, sessions are dropped with their connection
+
+# pending reply bytes before a connection waits for the client to read, and the longest request line
+WRITE_BUFFER = 64 * 1024
+MAX_LINE = 1024 * 1024
+
+
+class SharedLevel:
+    # read-only level data shared by every session playing it
+    def __init__(self, grid):
+        self.width = grid.width
+        cells = grid.width * grid.height
+        self.walls = bytes(grid.tiles)
+        self.goals = bytearray(cells)
+        for goal in grid.goals:
+            self.goals[goal] = 1
+        self.goal_count = len(grid.goals)
+        self.start_player = grid.player_start
+        self.start_boxes = array("I", sorted(grid.boxes))
+
+        # neighbour of every cell per lurd direction, -1 off the map
+        self.steps = array("i", [-1] * (cells * 4))
+        for cell in range(cells):
+            for direction, move in enumerate(MOVE_ORDER):
+                neighbour = grid.neighbour(cell, *DIRECTIONS[move])
+                if neighbour is not None:
+                    self.steps[cell * 4 + direction] = neighbour
+
+
+class Session:
+    __slots__ = ("level", "player", "boxes", "on_goals")
+
+    def __init__(self, level):
+        self.level = level
+        self.reset()
+
+    def reset(self):
+        self.player = self.level.start_player
+        self.boxes = array("I", self.level.start_boxes)
+        self.on_goals = sum(self.level.goals[box] for box in self.boxes)
+
+    @property
+    def solved(self):
+        # same rule as LevelGrid.solved, every goal covered
+        return self.on_goals == self.level.goal_count
+
+    def play(self, moves):
+        # Player.move / Box push rules on the compact state, blocked moves are skipped like in game;
+        # returns (applied moves, {box origin: box cell now} for boxes that moved)
+        moves = moves.lower()
+        invalid = set(moves).difference(MOVE_ORDER)
+        if invalid:
+            raise ValueError(f"bad moves {''.join(sorted(invalid))!r}")
+
+        level = self.level
+        walls, goals, steps, boxes = level.walls, level.goals, level.steps, self.boxes
+        player = self.player
+        applied = 0
+        moved = {}
+        for move in moves:
+            direction = MOVE_ORDER.index(move)
+            target = steps[player * 4 + direction]
+            if target < 0 or walls[target]:
+                continue
+            if target in boxes:
+                beyond = steps[target * 4 + direction]
+                if beyond < 0 or walls[beyond] or beyond in boxes:
+                    continue
+                boxes[boxes.index(target)] = beyond
+                self.on_goals += goals[beyond] - goals[target]
+                moved[beyond] = moved.pop(target, target)
+            player = target
+            applied += 1
+
+        self.player = player
+        return applied, {origin: cell for cell, origin in moved.items() if origin != cell}
+
+    def state(self):
+        return f"{self.player} {int(self.solved)} {','.join(map(str, self.boxes))}"
+
+
+class GameServer:
+    def __init__(self, levels_dir="levels", level_pack=None):
+        self.levels_dir = levels_dir
+        self.level_pack = level_pack
+        self.levels = {}
+        self.sessions = {}
+        self.next_id = 1
+
+    def level(self, number):
+        level = self.levels.get(number)
+        if level is None:
+            if self.level_pack:
+                path = f"{self.level_pack}#{number}"
+            else:
+                path = os.path.join(self.levels_dir, f"{number}_level.tmx")
+            level = self.levels[number] = SharedLevel(open_level(path))
+        return level
+
+    def new_session(self, number):
+        session_id = self.next_id
+        self.next_id += 1
+        self.sessions[session_id] = Session(self.level(number))
+        return session_id
+
+    def command(self, line, owned):
+        # one request line -> one reply line
+        parts = line.split()
+        if not parts:
+            return "ERR empty"
+        try:
+            name = parts[0].upper()
+            if name == "NEW":
+                session_id = self.new_session(int(parts[1]))
+                owned.add(session_id)
+                session = self.sessions[session_id]
+                return f"OK {session_id} {session.player} {','.join(map(str, session.boxes))}"
+
+            session_id = int(parts[1])
+            if session_id not in owned:
+                return "ERR unknown session"
+            session = self.sessions[session_id]
+            if name == "MOVE":
+                applied, moved = session.play(parts[2] if len(parts) > 2 else "")
+                deltas = " ".join(f"{origin}:{cell}" for origin, cell in moved.items())
+                return f"OK {applied} {session.player} {int(session.solved)} {deltas}".rstrip()
+            if name == "STATE":
+                return f"OK {session.state()}"
+            if name == "RESET":
+                session.reset()
+                return f"OK {session.state()}"
+            if name == "CLOSE":
+                owned.discard(session_id)
+                del self.sessions[session_id]
+                return "OK"
+            return "ERR unknown command"
+        except (IndexError, ValueError, OSError) as error:
+            return f"ERR {error}"
+
+    async def handle(self, reader, writer):
+        owned = set()
+        try:
+            async for line in reader:
+                writer.write((self.command(line.decode("ascii", "replace"), owned) + "\n").encode("ascii"))
+                # replies are batched, only wait on the socket once a client falls behind
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER:
+                    await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                del self.sessions[session_id]
+            writer.close()
+
+    async def serve(self, host, port, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, unix_path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+
+async def bench_client(port, level, sessions, rounds, batch, seed):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=MAX_LINE)
+    rng = random.Random(seed)
+
+    writer.write(f"NEW {level}\n".encode() * sessions)
+    ids = [int((await reader.readline()).split()[1]) for _ in range(sessions)]
+
+    moves = 0
+    for _ in range(rounds):
+        writer.write("".join(f"MOVE {session_id} {''.join(rng.choices(MOVE_ORDER, k=batch))}\n" for session_id in ids).encode())
+        for _ in ids:
+            moves += int((await reader.readline()).split()[1])
+    writer.close()
+    return moves
+
+
+async def bench_server(server, level, sessions, clients, rounds, batch):
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0, limit=MAX_LINE)
+    port = listener.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    applied = await asyncio.gather(*(
+        bench_client(port, level, sessions // clients, rounds, batch, seed) for seed in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    listener.close()
+    return rounds * batch * (sessions // clients) * clients, sum(applied), elapsed
+
+
+def bench(args):
+    server = GameServer(args.levels, args.pack)
+    level = server.level(args.level)
+
+    # compact state: memory per session with the shared level already loaded
+    tracemalloc.start()
+    sessions = [Session(level) for _ in range(args.sessions)]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{args.sessions} sessions: {memory / args.sessions:.0f} bytes/session ({memory / 1024 / 1024:.1f} MiB)")
+
+    # rules only, no networking
+    rng = random.Random(0)
+    scripts = ["".join(rng.choices(MOVE_ORDER, k=args.batch)) for _ in range(64)]
+    start = time.perf_counter()
+    for index, session in enumerate(sessions):
+        session.play(scripts[index % len(scripts)])
+    elapsed = time.perf_counter() - start
+    moves = args.sessions * args.batch
+    print(f"in process: {moves} moves in {elapsed:.3f}s ({moves / elapsed:.0f} moves/s)")
+    del sessions
+
+    # full round trip over TCP
+    sent, applied, elapsed = asyncio.run(bench_server(server, args.level, args.sessions, args.clients, args.rounds, args.batch))
+    print(
+        f"over tcp: {sent} moves ({applied} applied) in {elapsed:.3f}s "
+        f"({sent / elapsed:.0f} moves/s, {args.sessions * args.rounds / elapsed:.0f} batches/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-session game server over TCP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--levels", default="levels", help="directory of N_level.tmx levels")
+    parser.add_argument("--pack", help=".xsb/.sok collection to serve instead of --levels")
+    parser.add_argument("--bench", action="store_true", help="measure moves per second and exit")
+    parser.add_argument("--level", type=int, default=1, help="level used by --bench")
+    parser.add_argument("--sessions", type=int, default=20000, help="sessions used by --bench")
+    parser.add_argument("--clients", type=int, default=8, help="connections used by --bench")
+    parser.add_argument("--rounds", type=int, default=5, help="move batches per session in --bench")
+    parser.add_argument("--batch", type=int, default=32, help="moves per batch in --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+
+    try:
+        asyncio.run(GameServer(args.levels, args.pack).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,36 @@
 FPS = 60
 DISPLAY_RESOLUTION = (WIDTH, HEIGHT) = (1280, 768)
+
+# only redraw and update the screen areas that changed each frame
+DIRTY_RENDERING = True
+
+# level transition length in milliseconds
+TRANSITION_TIME = 2000
+
+# record every played level to a replay file, only the newest REPLAY_KEEP files are kept
+RECORD_REPLAYS = False
+REPLAY_DIR = "replays"
+REPLAY_KEEP = 100
+
+# stream profiler spans to this Chrome trace file, None to disable
+PROFILER_TRACE_PATH = None
+
+# once nothing has changed for IDLE_AFTER frames, block on input for up to IDLE_TIMEOUT ms
+# instead of running frames, None keeps the fixed frame rate
+IDLE_TIMEOUT = 1000
+IDLE_AFTER = 10
+
+# .xsb/.sok level collection played instead of levels/N_level.tmx, None to use the .tmx levels
+LEVEL_PACK = None
+
+# keypresses buffered between frames, and how many of them are applied per frame, None for all
+INPUT_QUEUE_SIZE = 64
+INPUT_DRAIN_LIMIT = None
+
+# tint boxes pushed onto squares they can never leave towards a goal
+HIGHLIGHT_DEAD_SQUARES = True
+DEAD_BOX_TINT = (255, 110, 110)
+
+# click-to-move: most box positions a push search looks at before giving up, and the selected box highlight
+PUSH_SEARCH_LIMIT = 50000
+SELECTED_BOX_TINT = (60, 60, 60)
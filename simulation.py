@@ -0,0 +1,88 @@
+import argparse
+import sys
+import time
+
+from grid import DIRECTIONS, MoveLog
+from utils.replay import Replay, state_hash
+from utils.level_pack import open_level
+
+
+class Simulation:
+    def __init__(self, grid):
+        # same rules as Player/Box, without sprites, rendering or a frame cap
+        self.grid = grid
+        self.player = grid.player_start
+        self.initial_boxes = tuple(grid.boxes)
+        self.moves = MoveLog()
+
+    def apply(self, action):
+        if action in DIRECTIONS:
+            result = self.grid.step(self.player, *DIRECTIONS[action])
+            if result is not None:
+                self.player, pushed = result
+                self.moves.record(action, pushed)
+        elif action == "z":
+            step = self.moves.undo()
+            if step is not None:
+                self.player = self.grid.unstep(self.player, *DIRECTIONS[step[0]], step[1])
+        elif action == "y":
+            step = self.moves.redo()
+            if step is not None:
+                self.player = self.grid.step(self.player, *DIRECTIONS[step[0]])[0]
+        elif action == "x":
+            self.grid.restore(self.initial_boxes)
+            self.player = self.grid.player_start
+            self.moves.clear()
+
+    def run(self, actions):
+        for action in actions:
+            self.apply(action)
+        return state_hash(self.grid, self.player)
+
+
+def play_replay(replay):
+    simulation = Simulation(open_level(replay.level_path))
+    final_hash = simulation.run(action for _, action in replay.actions)
+    return final_hash == replay.final_hash, len(replay.actions), simulation
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the game rules headless on replays or scripted input.")
+    parser.add_argument("replays", nargs="*", help="replay files to play back and check")
+    parser.add_argument("--level", help="level to run --script on, a .tmx or pack.xsb#number")
+    parser.add_argument("--script", default="", help="actions: lurd moves, z undo, y redo, x restart")
+    parser.add_argument("--repeat", type=positive_int, default=1, help="run the script this many times")
+    args = parser.parse_args()
+
+    steps = failures = 0
+    start_time = time.perf_counter()
+
+    for path in args.replays:
+        matched, count, simulation = play_replay(Replay.load(path))
+        steps += count
+        failures += not matched
+        print(f"{path}: {'OK' if matched else 'MISMATCH'} steps={count} solved={simulation.grid.solved}")
+
+    if args.level:
+        simulation = Simulation(open_level(args.level))
+        for _ in range(args.repeat):
+            # restart between runs instead of reloading the level
+            simulation.apply("x")
+            final_hash = simulation.run(args.script.lower())
+            steps += len(args.script)
+        print(f"{args.level}: hash={final_hash:08x} moves={simulation.moves.lurd()} solved={simulation.grid.solved}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{steps} steps in {elapsed:.3f}s ({steps / elapsed if elapsed else 0:.0f} steps/s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import heapq
+import random
+import sys
+import time
+from collections import deque
+
+from grid import DIRECTIONS, load_level
+from pathfinding import flood, walk_path
+
+INF = float("inf")
+
+
+class SolveResult:
+    def __init__(self, moves, status, nodes, memory, elapsed):
+        self.moves = moves  # LURD string, None if no solution was found
+        self.status = status  # "solved", "unsolvable", "node budget" or "memory budget"
+        self.nodes = nodes
+        self.memory = memory  # peak bytes held by the open list and transposition table
+        self.elapsed = elapsed
+
+    @property
+    def solved(self):
+        return self.moves is not None
+
+    @property
+    def pushes(self):
+        return sum(move.isupper() for move in self.moves) if self.moves else 0
+
+
+class Solver:
+    def __init__(self, grid, max_nodes=None, max_memory=None, seed=0):
+        self.grid = grid
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+
+        # zobrist keys for box and (normalised) player cells
+        rng = random.Random(seed)
+        size = grid.width * grid.height
+        self.box_keys = [rng.getrandbits(64) for _ in range(size)]
+        self.player_keys = [rng.getrandbits(64) for _ in range(size)]
+
+        # push distance from every cell to every goal, ignoring other boxes
+        self.goals = sorted(grid.goals)
+        self.distances = [self.pull_distances(goal) for goal in self.goals]
+
+        # a box on a dead square can never reach a goal
+        self.dead = bytearray(size)
+        for cell in range(size):
+            if not grid.is_wall(cell) and all(dist[cell] == INF for dist in self.distances):
+                self.dead[cell] = 1
+
+    def pull_distances(self, goal):
+        # reverse search: pull a box away from the goal, the player walks in front of it
+        distances = [INF] * (self.grid.width * self.grid.height)
+        distances[goal] = 0
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            for dx, dy in DIRECTIONS.values():
+                previous = self.grid.neighbour(cell, dx, dy)
+                player = self.grid.neighbour(previous, dx, dy) if previous is not None else None
+                if self.grid.is_wall(previous) or self.grid.is_wall(player):
+                    continue
+                if distances[previous] == INF:
+                    distances[previous] = distances[cell] + 1
+                    queue.append(previous)
+        return distances
+
+    def reachable(self, player, boxes):
+        # player region, plus the smallest cell in it used as the normalised position
+        region = flood(self.grid, player, boxes)
+        return region, min(region)
+
+    def heuristic(self, boxes):
+        # minimum cost matching of goals to boxes (hungarian method)
+        boxes = list(boxes)
+        rows, columns = len(self.goals), len(boxes)
+        if rows == 0:
+            return 0
+        if rows > columns:
+            return INF
+
+        u = [0] * (rows + 1)
+        v = [0] * (columns + 1)
+        match = [0] * (columns + 1)
+        way = [0] * (columns + 1)
+        for row in range(1, rows + 1):
+            match[0] = row
+            column = 0
+            minimum = [INF] * (columns + 1)
+            used = [False] * (columns + 1)
+            while match[column]:
+                used[column] = True
+                current = match[column]
+                delta = INF
+                next_column = 0
+                for j in range(1, columns + 1):
+                    if not used[j]:
+                        cost = self.distances[current - 1][boxes[j - 1]] - u[current] - v[j]
+                        if cost < minimum[j]:
+                            minimum[j] = cost
+                            way[j] = column
+                        if minimum[j] < delta:
+                            delta = minimum[j]
+                            next_column = j
+                if delta == INF:
+                    return INF
+                for j in range(columns + 1):
+                    if used[j]:
+                        u[match[j]] += delta
+                        v[j] -= delta
+                    else:
+                        minimum[j] -= delta
+                column = next_column
+            while column:
+                previous = way[column]
+                match[column] = match[previous]
+                column = previous
+
+        return sum(self.distances[match[j] - 1][boxes[j - 1]] for j in range(1, columns + 1) if match[j])
+
+    def is_frozen(self, cell, boxes, checking):
+        # a box is frozen when it is blocked on both axes, boxes being checked count as walls
+        checking.add(cell)
+        try:
+            for dx, dy in ((1, 0), (0, 1)):
+                before = self.grid.neighbour(cell, -dx, -dy)
+                after = self.grid.neighbour(cell, dx, dy)
+                if self.grid.is_wall(before) or self.grid.is_wall(after):
+                    continue
+                if before in checking or after in checking:
+                    continue
+                if self.dead[before] and self.dead[after]:
+                    continue
+                if before in boxes and self.is_frozen(before, boxes, checking):
+                    continue
+                if after in boxes and self.is_frozen(after, boxes, checking):
+                    continue
+                return False
+            return True
+        finally:
+            checking.discard(cell)
+
+    def solve(self, player=None, boxes=None):
+        start_time = time.perf_counter()
+        player = self.grid.player_start if player is None else player
+        boxes = frozenset(self.grid.boxes if boxes is None else boxes)
+        start = player, boxes
+
+        # deadlock pruning is only safe when every box has to end up on a goal
+        prune = len(boxes) == len(self.goals)
+        goals = frozenset(self.goals)
+
+        box_hash = 0
+        for box in boxes:
+            box_hash ^= self.box_keys[box]
+
+        counter = 0
+        estimate = self.heuristic(boxes)
+        if estimate == INF:
+            return SolveResult(None, "unsolvable", 0, 0, time.perf_counter() - start_time)
+
+        # open entries: (f, -g, counter, player, boxes, box_hash, parent key, push)
+        open_list = [(estimate, 0, counter, player, boxes, box_hash, None, None)]
+        table = {}  # transposition table: zobrist key -> (parent key, push)
+        memory = peak_memory = sys.getsizeof(open_list[0]) + sys.getsizeof(boxes)
+        nodes = 0
+
+        while open_list:
+            entry = heapq.heappop(open_list)
+            _, negative_g, _, player, boxes, box_hash, parent, push = entry
+            memory -= sys.getsizeof(entry) + sys.getsizeof(boxes)
+
+            region, normalised = self.reachable(player, boxes)
+            key = box_hash ^ self.player_keys[normalised]
+            if key in table:
+                continue
+            table[key] = (parent, push)
+            memory += sys.getsizeof(key) + sys.getsizeof(table[key])
+
+            if goals <= boxes:
+                moves = self.replay(key, table, *start)
+                return SolveResult(moves, "solved", nodes, peak_memory, time.perf_counter() - start_time)
+
+            nodes += 1
+            if self.max_nodes is not None and nodes > self.max_nodes:
+                return SolveResult(None, "node budget", nodes, peak_memory, time.perf_counter() - start_time)
+
+            g = 1 - negative_g
+            for box in boxes:
+                for move, (dx, dy) in DIRECTIONS.items():
+                    behind = self.grid.neighbour(box, -dx, -dy)
+                    target = self.grid.neighbour(box, dx, dy)
+                    if behind not in region or self.grid.is_wall(target) or target in boxes:
+                        continue
+                    if prune and self.dead[target]:
+                        continue
+
+                    new_boxes = boxes - {box} | {target}
+                    if prune and target not in goals and self.is_frozen(target, new_boxes, set()):
+                        continue
+
+                    estimate = self.heuristic(new_boxes)
+                    if estimate == INF:
+                        continue
+
+                    counter += 1
+                    child = (
+                        g + estimate, -g, counter, box, new_boxes,
+                        box_hash ^ self.box_keys[box] ^ self.box_keys[target],
+                        key, (box, move),
+                    )
+                    heapq.heappush(open_list, child)
+                    memory += sys.getsizeof(child) + sys.getsizeof(new_boxes)
+
+            peak_memory = max(peak_memory, memory + sys.getsizeof(open_list) + sys.getsizeof(table))
+            if self.max_memory is not None and peak_memory > self.max_memory:
+                return SolveResult(None, "memory budget", nodes, peak_memory, time.perf_counter() - start_time)
+
+        return SolveResult(None, "unsolvable", nodes, peak_memory, time.perf_counter() - start_time)
+
+    def replay(self, key, table, player, boxes):
+        # walk the transposition table back to the root, then expand pushes into LURD moves
+        pushes = []
+        while True:
+            parent, push = table[key]
+            if push is None:
+                break
+            pushes.append(push)
+            key = parent
+
+        boxes = set(boxes)
+        moves = []
+        for box, move in reversed(pushes):
+            dx, dy = DIRECTIONS[move]
+            moves.append(walk_path(self.grid, player, self.grid.neighbour(box, -dx, -dy), boxes))
+            moves.append(move.upper())
+            boxes.remove(box)
+            boxes.add(self.grid.neighbour(box, dx, dy))
+            player = box
+        return "".join(moves)
+
+
+def solve_level(path, max_nodes=None, max_memory=None):
+    return Solver(load_level(path), max_nodes, max_memory).solve()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find push-optimal solutions for Sokoban levels.")
+    parser.add_argument("levels", nargs="+", help="paths to .tmx level files")
+    parser.add_argument("--max-nodes", type=int, default=None)
+    parser.add_argument("--max-memory", type=int, default=None, help="bytes")
+    args = parser.parse_args()
+
+    for path in args.levels:
+        result = solve_level(path, args.max_nodes, args.max_memory)
+        print(
+            f"{path}: {result.status} moves={result.moves or '-'} pushes={result.pushes} "
+            f"nodes={result.nodes} memory={result.memory} time={result.elapsed:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
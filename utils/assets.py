@@ -0,0 +1,65 @@
+import pygame
+
+
+class AssetManager:
+    def __init__(self):
+        # surfaces keyed by (path, size, convert mode), fonts by (path, size),
+        # tileset tiles by (path, index, tile size)
+        self.images = {}
+        self.fonts = {}
+        self.tiles = {}
+
+    def image(self, path, size=None, convert="alpha"):
+        # convert: "alpha" -> convert_alpha(), "opaque" -> convert(), None -> as loaded
+        key = (path, size, convert)
+        surface = self.images.get(key)
+        if surface is None:
+            if size is not None:
+                surface = pygame.transform.scale(self.image(path, None, convert), size)
+            else:
+                surface = pygame.image.load(path)
+                if convert == "alpha":
+                    surface = surface.convert_alpha()
+                elif convert == "opaque":
+                    surface = surface.convert()
+            self.images[key] = surface
+        return surface
+
+    def font(self, path, size):
+        key = (path, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.Font(path, size)
+        return font
+
+    def tile(self, path, index, columns, tile_size):
+        # subsurface of a tileset image, shares pixels with the cached tileset
+        key = (path, index, tile_size)
+        surface = self.tiles.get(key)
+        if surface is None:
+            width, height = tile_size
+            area = pygame.Rect((index % columns) * width, (index // columns) * height, width, height)
+            surface = self.tiles[key] = self.image(path).subsurface(area)
+        return surface
+
+    def preload(self, images=(), fonts=()):
+        # images: (path, size, convert) tuples, fonts: (path, size) tuples
+        for image in images:
+            self.image(*image)
+        for font in fonts:
+            self.font(*font)
+
+    def evict(self, path=None):
+        # drop everything loaded from path, or the whole cache
+        if path is None:
+            self.images.clear()
+            self.fonts.clear()
+            self.tiles.clear()
+            return
+
+        for cache in (self.images, self.fonts, self.tiles):
+            for key in [key for key in cache if key[0] == path]:
+                del cache[key]
+
+
+assets = AssetManager()
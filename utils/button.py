@@ -5,11 +5,18 @@ class Button():
 		self.y_pos = pos[1]
 		self.font = font
 		self.base_color, self.hovering_color = base_color, hovering_color
-		self.text_input = text_input
-		self.text = self.font.render(self.text_input, True, self.base_color)
+		self.hovered = False
+		self.setText(text_input)
 		if self.image is None:
 			self.image = self.text
 		self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+
+	def setText(self, text_input):
+		# render both states once, hovering only swaps surfaces
+		self.text_input = text_input
+		self.base_text = self.font.render(self.text_input, True, self.base_color)
+		self.hover_text = self.font.render(self.text_input, True, self.hovering_color)
+		self.text = self.hover_text if self.hovered else self.base_text
 		self.text_rect = self.text.get_rect(center=(self.x_pos, self.y_pos))
 
 	def update(self, screen):
@@ -18,12 +25,13 @@ class Button():
 		screen.blit(self.text, self.text_rect)
 
 	def checkForInput(self, position):
-		if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-			return True
-		return False
+		return self.rect.collidepoint(position)
 
 	def changeColor(self, position):
-		if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-			self.text = self.font.render(self.text_input, True, self.hovering_color)
-		else:
-			self.text = self.font.render(self.text_input, True, self.base_color)
\ No newline at end of file
+		# returns True when the hover state changed and the button needs a redraw
+		hovered = self.rect.collidepoint(position)
+		if hovered == self.hovered:
+			return False
+		self.hovered = hovered
+		self.text = self.hover_text if hovered else self.base_text
+		return True
@@ -0,0 +1,14 @@
+import pygame
+
+
+def wait_events(timeout):
+    # sleep until an event arrives or timeout ms pass, then return everything queued;
+    # a timeout of None polls without blocking
+    if timeout is None:
+        return pygame.event.get()
+
+    event = pygame.event.wait(timeout)
+    events = pygame.event.get()
+    if event.type != pygame.NOEVENT:
+        events.insert(0, event)
+    return events
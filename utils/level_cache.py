@@ -0,0 +1,209 @@
+import os
+import struct
+import xml.etree.ElementTree as ElementTree
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from grid import LevelGrid, WALL, read_tmx
+from utils.tmx_writer import BOX_GID, WALL_GID
+
+MAGIC = b"SKBL"
+VERSION = 1
+
+# magic, version, width, height, tile size, source mtime_ns, source size, player x, player y
+HEADER = struct.Struct("<4sHHHHqqdd")
+# firstgid, columns, tile width, tile height, image path length
+TILESET = struct.Struct("<HHHHH")
+
+
+class CompiledLevel:
+    def __init__(self, width, height, tile_size, wall_gids, box_gids, goals, player_position, tilesets, source_stat):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.wall_gids = wall_gids  # array("H"), one gid per cell of the Collisions layer
+        self.box_gids = box_gids  # array("H"), one gid per cell of the Boxes layer
+        self.goals = goals
+        self.player_position = player_position  # pixel position of the player marker
+        self.tilesets = tilesets  # (firstgid, image path, columns, tile width, tile height)
+        self.source_stat = source_stat  # (mtime_ns, size) of the .tmx it was built from
+
+    @classmethod
+    def from_grid(cls, grid, tilesets, source_stat):
+        # levels that don't come from a .tmx, walls and boxes use the same gids as the hand made levels
+        size = grid.width * grid.height
+        wall_gids = array("H", (WALL_GID if grid.is_wall(cell) else 0 for cell in range(size)))
+        box_gids = array("H", (BOX_GID if cell in grid.boxes else 0 for cell in range(size)))
+        player_position = None
+        if grid.player_start is not None:
+            x, y = grid.position_of(grid.player_start)
+            player_position = (x + grid.tile_size / 2, y + grid.tile_size / 2)
+        return cls(grid.width, grid.height, grid.tile_size, wall_gids, box_gids, tuple(sorted(grid.goals)), player_position, tilesets, source_stat)
+
+    def make_grid(self):
+        # fresh, mutable grid for a play session
+        grid = LevelGrid(self.width, self.height, self.tile_size)
+        for cell, gid in enumerate(self.wall_gids):
+            if gid:
+                grid.tiles[cell] = WALL
+        grid.boxes.update(cell for cell, gid in enumerate(self.box_gids) if gid)
+        grid.goals.update(self.goals)
+        grid.boxes_on_goals = len(grid.boxes & grid.goals)
+        if self.player_position is not None:
+            grid.player_start = grid.cell_at(self.player_position)
+        return grid
+
+    def tiles(self, gids):
+        # (cell, gid) pairs of a layer, skipping empty cells
+        return [(cell, gid) for cell, gid in enumerate(gids) if gid]
+
+    def tileset_for(self, gid):
+        # (image path, tile index, columns, tile width, tile height) of a gid
+        for firstgid, path, columns, tile_width, tile_height in reversed(self.tilesets):
+            if gid >= firstgid:
+                return path, gid - firstgid, columns, tile_width, tile_height
+        raise ValueError(f"gid {gid} is not in any tileset")
+
+    def to_bytes(self):
+        player_x, player_y = self.player_position if self.player_position is not None else (float("nan"),) * 2
+        chunks = [HEADER.pack(MAGIC, VERSION, self.width, self.height, self.tile_size, *self.source_stat, player_x, player_y)]
+
+        chunks.append(struct.pack("<H", len(self.tilesets)))
+        for firstgid, path, columns, tile_width, tile_height in self.tilesets:
+            encoded = path.encode("utf-8")
+            chunks.append(TILESET.pack(firstgid, columns, tile_width, tile_height, len(encoded)))
+            chunks.append(encoded)
+
+        chunks.append(self.wall_gids.tobytes())
+        chunks.append(self.box_gids.tobytes())
+        chunks.append(struct.pack("<I", len(self.goals)))
+        chunks.append(array("I", self.goals).tobytes())
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, width, height, tile_size, mtime_ns, size, player_x, player_y = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a compiled level or outdated format")
+        offset = HEADER.size
+
+        (count,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+        tilesets = []
+        for _ in range(count):
+            firstgid, columns, tile_width, tile_height, length = TILESET.unpack_from(data, offset)
+            offset += TILESET.size
+            path = data[offset:offset + length].decode("utf-8")
+            offset += length
+            tilesets.append((firstgid, path, columns, tile_width, tile_height))
+
+        cells = width * height
+        wall_gids = array("H", data[offset:offset + cells * 2])
+        offset += cells * 2
+        box_gids = array("H", data[offset:offset + cells * 2])
+        offset += cells * 2
+
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        goals = tuple(array("I", data[offset:offset + count * 4]))
+
+        player_position = None if player_x != player_x else (player_x, player_y)
+        return cls(width, height, tile_size, wall_gids, box_gids, goals, player_position, tilesets, (mtime_ns, size))
+
+
+def source_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_tileset(firstgid, tsx_path):
+    # (firstgid, image path, columns, tile width, tile height) from an external .tsx
+    tileset = ElementTree.parse(tsx_path).getroot()
+    return tileset_entry(firstgid, tileset, os.path.dirname(tsx_path))
+
+
+def tileset_entry(firstgid, tileset, base_dir):
+    image = tileset.find("image")
+    return (
+        firstgid,
+        os.path.normpath(os.path.join(base_dir, image.get("source"))),
+        int(tileset.get("columns")),
+        int(tileset.get("tilewidth")),
+        int(tileset.get("tileheight")),
+    )
+
+
+def compile_level(path):
+    root, layers, markers = read_tmx(path)
+    width, height = int(root.get("width")), int(root.get("height"))
+    tile_size = int(root.get("tilewidth"))
+    level_dir = os.path.dirname(path)
+
+    # tilesets, image paths resolved relative to the working directory like the other assets
+    tilesets = []
+    for tileset in root.iter("tileset"):
+        firstgid = int(tileset.get("firstgid"))
+        if tileset.get("source"):
+            tilesets.append(load_tileset(firstgid, os.path.join(level_dir, tileset.get("source"))))
+        else:
+            tilesets.append(tileset_entry(firstgid, tileset, level_dir))
+    tilesets.sort()
+
+    empty = bytes(width * height * 2)
+    wall_gids = array("H", layers["Collisions"]) if "Collisions" in layers else array("H", empty)
+    box_gids = array("H", layers["Boxes"]) if "Boxes" in layers else array("H", empty)
+
+    goals = []
+    player_position = None
+    for name, position in markers:
+        if name == "player":
+            player_position = position
+        elif name == "box_point":
+            goals.append(int(position[1] // tile_size) * width + int(position[0] // tile_size))
+
+    return CompiledLevel(width, height, tile_size, wall_gids, box_gids, tuple(goals), player_position, tilesets, source_stat(path))
+
+
+def cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, ".cache", os.path.splitext(name)[0] + ".bin")
+
+
+def load_level(path):
+    # compiled level from the on-disk cache, rebuilt when the .tmx changed
+    cached = cache_path(path)
+    if os.path.exists(cached):
+        try:
+            with open(cached, "rb") as f:
+                level = CompiledLevel.from_bytes(f.read())
+            if level.source_stat == source_stat(path):
+                return level
+        except (ValueError, struct.error):
+            pass
+
+    level = compile_level(path)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    temp_path = f"{cached}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(level.to_bytes())
+    os.replace(temp_path, cached)
+    return level
+
+
+# levels decoded ahead of time on a worker thread
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-prefetch")
+pending = {}
+
+
+def prefetch(path):
+    if path not in pending and os.path.exists(path):
+        pending[path] = executor.submit(load_level, path)
+
+
+def get_level(path):
+    future = pending.pop(path, None)
+    if future is not None:
+        level = future.result()
+        if level.source_stat == source_stat(path):
+            return level
+    return load_level(path)
@@ -0,0 +1,173 @@
+import mmap
+import os
+import struct
+from array import array
+
+from grid import LevelGrid, WALL, load_level
+from utils import level_cache
+from utils.tmx_writer import TILESET_PATH
+
+PACK_EXTENSIONS = (".xsb", ".sok")
+
+MAGIC = b"SKBI"
+VERSION = 1
+
+# magic, version, source mtime_ns, source size, level count
+HEADER = struct.Struct("<4sHqqI")
+
+# characters a board row may contain, digits and | are run-length encoding
+BOARD_CHARS = b"#@+$*.-_ |0123456789\r"
+
+
+def is_board_line(line):
+    return b"#" in line and not line.translate(None, BOARD_CHARS)
+
+
+def scan_levels(data):
+    # (start, end) byte offsets of every run of board rows, titles and comments in between are skipped
+    offsets = array("Q")
+    start = None
+    position = 0
+    size = len(data)
+    while position < size:
+        end = data.find(b"\n", position)
+        if end < 0:
+            end = size
+        if is_board_line(data[position:end]):
+            if start is None:
+                start = position
+        elif start is not None:
+            offsets.extend((start, position))
+            start = None
+        position = end + 1
+    if start is not None:
+        offsets.extend((start, size))
+    return offsets
+
+
+def expand_rows(text):
+    # undo run-length encoding ("3#" is "###", "|" ends a row)
+    rows = []
+    for line in text.replace("|", "\n").splitlines():
+        row = []
+        count = ""
+        for char in line.rstrip("\r"):
+            if char.isdigit():
+                count += char
+            else:
+                row.append(char * int(count or 1))
+                count = ""
+        rows.append("".join(row))
+    return rows
+
+
+def parse_level(text, tile_size=64):
+    rows = expand_rows(text)
+    grid = LevelGrid(max(len(row) for row in rows), len(rows), tile_size)
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            cell = grid.index(x, y)
+            if char == "#":
+                grid.tiles[cell] = WALL
+            if char in "$*":
+                grid.boxes.add(cell)
+            if char in ".*+":
+                grid.goals.add(cell)
+            if char in "@+":
+                grid.player_start = cell
+    grid.boxes_on_goals = len(grid.boxes & grid.goals)
+    return grid
+
+
+def index_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, ".cache", name + ".idx")
+
+
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.source_stat = level_cache.source_stat(path)
+
+        # the file is mapped, not read, only the bytes of a level being parsed are paged in
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.source_stat[1] else b""
+        self.offsets = self.load_index()
+
+        # every level is drawn with the default tileset, parsed on first use
+        self.tilesets = None
+
+        # levels compiled ahead of time on the level_cache worker thread, by number
+        self.prefetched = {}
+
+    def load_index(self):
+        # offsets from the on-disk index, rescanned when the pack changed
+        cached = index_path(self.path)
+        try:
+            with open(cached, "rb") as f:
+                data = f.read()
+            magic, version, mtime_ns, size, count = HEADER.unpack_from(data)
+            if magic == MAGIC and version == VERSION and (mtime_ns, size) == self.source_stat:
+                offsets = array("Q", data[HEADER.size:HEADER.size + count * 16])
+                if len(offsets) == count * 2:
+                    return offsets
+        except (OSError, struct.error):
+            pass
+
+        offsets = scan_levels(self.data)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp_path = f"{cached}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, *self.source_stat, len(offsets) // 2))
+            f.write(offsets.tobytes())
+        os.replace(temp_path, cached)
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets) // 2
+
+    def text(self, number):
+        # board rows of a level, numbered from 1 like the .tmx levels
+        if not 1 <= number <= len(self):
+            raise IndexError(f"{self.path} has no level {number}")
+        start, end = self.offsets[2 * number - 2], self.offsets[2 * number - 1]
+        return self.data[start:end].decode("ascii")
+
+    def level(self, number):
+        grid = parse_level(self.text(number))
+        if grid.player_start is None:
+            raise ValueError(f"{self.path} level {number} has no player (@ or +)")
+        return grid
+
+    def compiled(self, number):
+        # the level in the form Game.setup_map loads, usually already compiled by prefetch
+        future = self.prefetched.pop(number, None)
+        if future is not None:
+            return future.result()
+        return self.compile(number)
+
+    def compile(self, number):
+        if self.tilesets is None:
+            self.tilesets = [level_cache.load_tileset(1, TILESET_PATH)]
+        return level_cache.CompiledLevel.from_grid(self.level(number), self.tilesets, self.source_stat)
+
+    def prefetch(self, number):
+        if 1 <= number <= len(self) and number not in self.prefetched:
+            self.prefetched[number] = level_cache.executor.submit(self.compile, number)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+def open_level(path):
+    # LevelGrid for a .tmx path or a "pack.xsb#number" reference
+    pack_path, _, number = path.rpartition("#")
+    if pack_path and os.path.splitext(pack_path)[1].lower() in PACK_EXTENSIONS:
+        pack = LevelPack(pack_path)
+        try:
+            return pack.level(int(number))
+        finally:
+            pack.close()
+    return load_level(path)
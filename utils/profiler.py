@@ -0,0 +1,139 @@
+import os
+import json
+import atexit
+import functools
+import threading
+from collections import deque
+from time import perf_counter_ns
+
+# frames kept for the percentile readout, and how often the HUD text is re-rendered
+FRAME_WINDOW = 240
+HUD_REFRESH = 15
+
+class Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, perf_counter_ns())
+
+class NullSpan:
+    # shared do-nothing span handed out while profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+NULL_SPAN = NullSpan()
+
+class Profiler:
+    def __init__(self):
+        self.hud_visible = False
+        self.trace = None
+        self.trace_first = True
+        self.lock = threading.Lock()
+        self.origin = perf_counter_ns()
+
+        self.frame_times = deque(maxlen=FRAME_WINDOW)
+        self.frame_start_ns = 0
+        self.frame_count = 0
+
+        self.hud_surface = None
+        self.hud_rect = None
+
+    @property
+    def active(self):
+        return self.hud_visible or self.trace is not None
+
+    def start_trace(self, path):
+        # chrome://tracing / Perfetto JSON array, streamed as spans finish
+        self.trace = open(path, "w")
+        self.trace.write("[\n")
+        self.trace_first = True
+        atexit.register(self.stop_trace)
+
+    def stop_trace(self):
+        with self.lock:
+            if self.trace is not None:
+                self.trace.write("\n]\n")
+                self.trace.close()
+                self.trace = None
+
+    def span(self, name):
+        return Span(self, name) if self.active else NULL_SPAN
+
+    def profiled(self, name):
+        # decorator form of span()
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, start, end):
+        if self.trace is None:
+            return
+        event = json.dumps({
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        })
+        with self.lock:
+            if self.trace is not None:
+                self.trace.write(event if self.trace_first else ",\n" + event)
+                self.trace_first = False
+
+    def frame_start(self):
+        if self.active:
+            self.frame_start_ns = perf_counter_ns()
+
+    def frame_end(self):
+        if self.active and self.frame_start_ns:
+            end = perf_counter_ns()
+            self.frame_times.append((end - self.frame_start_ns) / 1_000_000)
+            self.record("frame", self.frame_start_ns, end)
+            self.frame_count += 1
+
+    def percentiles(self):
+        if not self.frame_times:
+            return 0, 0, 0
+        times = sorted(self.frame_times)
+        pick = lambda fraction: times[min(len(times) - 1, int(len(times) * fraction))]
+        return pick(0.5), pick(0.95), pick(0.99)
+
+    def toggle_hud(self):
+        self.hud_visible = not self.hud_visible
+        self.frame_times.clear()
+        self.hud_surface = None
+
+    def draw_hud(self, screen, font, fps, background):
+        # returns the rects it touched, the text is only re-rendered every HUD_REFRESH frames
+        if self.hud_surface is not None and self.frame_count % HUD_REFRESH:
+            return []
+
+        rects = []
+        if self.hud_rect is not None:
+            screen.blit(background, self.hud_rect, self.hud_rect)
+            rects.append(self.hud_rect)
+
+        p50, p95, p99 = self.percentiles()
+        text = f"FPS {fps:.0f}  p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms"
+        self.hud_surface = font.render(text, True, "white", "black")
+        self.hud_rect = screen.blit(self.hud_surface, (10, 10))
+        rects.append(self.hud_rect)
+        return rects
+
+profiler = Profiler()
@@ -0,0 +1,102 @@
+import os
+import struct
+import zlib
+from array import array
+
+MAGIC = b"SKRP"
+VERSION = 1
+
+# l/u/r/d moves, z undo, y redo, x restart
+ACTIONS = "lurdzyx"
+
+# magic, version, level path length
+HEADER = struct.Struct("<4sHH")
+# action count, final state hash
+FOOTER = struct.Struct("<II")
+
+
+def state_hash(grid, player):
+    # crc of the box set and player cell, identical runs give identical hashes
+    return zlib.crc32(array("I", sorted(grid.boxes)).tobytes() + struct.pack("<I", player))
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Replay:
+    def __init__(self, level_path, actions=None, final_hash=0):
+        self.level_path = level_path
+        self.actions = actions if actions is not None else []  # (frame, action) pairs
+        self.final_hash = final_hash
+
+    def record(self, frame, action):
+        self.actions.append((frame, action))
+
+    def to_bytes(self):
+        path = self.level_path.encode("utf-8")
+        out = bytearray(HEADER.pack(MAGIC, VERSION, len(path)))
+        out += path
+        out += FOOTER.pack(len(self.actions), self.final_hash)
+
+        # frame deltas as varints, usually a single byte each
+        previous = 0
+        for frame, action in self.actions:
+            write_varint(out, frame - previous)
+            out.append(ACTIONS.index(action))
+            previous = frame
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a replay file or outdated format")
+        offset = HEADER.size
+        level_path = data[offset:offset + length].decode("utf-8")
+        offset += length
+        count, final_hash = FOOTER.unpack_from(data, offset)
+        offset += FOOTER.size
+
+        actions = []
+        frame = 0
+        for _ in range(count):
+            delta, offset = read_varint(data, offset)
+            frame += delta
+            actions.append((frame, ACTIONS[data[offset]]))
+            offset += 1
+        return cls(level_path, actions, final_hash)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def prune_replays(directory, keep):
+    # delete the oldest .rpl files so at most keep are left
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".rpl")]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - keep)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,24 +1,155 @@
 import os
 import json
+import atexit
+import threading
+import time
 
-def initiate_save_file():
-    with open("game.json", "w") as f:
-        data = {
-            "current_level": 1
+from grid import steps_to_lurd
+from utils.profiler import profiler
+
+SAVE_PATH = "game.json"
+
+# seconds to wait for more changes before writing, so bursts of updates cost one write
+WRITE_DELAY = 0.25
+
+def default_data():
+    return {
+        "current_level": 1,
+        "best": {},  # level -> {"moves": n, "pushes": n}
+        "in_progress": None,  # {"level": n, "moves": "LURD..."}
+    }
+
+def encode(value):
+    # in-progress moves are kept as move log bytes and only turned into LURD when written
+    if isinstance(value, bytes):
+        return steps_to_lurd(value)
+    raise TypeError(f"can't save {type(value).__name__}")
+
+class SaveManager:
+    def __init__(self, path=SAVE_PATH):
+        self.path = path
+        self.data = None
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.writer = None
+        self.stopping = False
+
+        # held for a whole write, so the writer and a final flush never share the temp file
+        self.write_lock = threading.Lock()
+
+    def load(self):
+        # read the save file once, everything after that is served from memory
+        if self.data is None:
+            data = default_data()
+            try:
+                with open(self.path, "r") as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            self.data = data
+        return self.data
+
+    def mark_dirty(self):
+        with self.changed:
+            self.dirty = True
+            self.changed.notify()
+
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_behind, name="save-writer", daemon=True)
+            self.writer.start()
+
+    def write_behind(self):
+        while True:
+            with self.changed:
+                while not self.dirty and not self.stopping:
+                    self.changed.wait()
+
+                # let rapid updates pile up until a fixed deadline, their notifies don't end the wait early
+                deadline = time.monotonic() + WRITE_DELAY
+                while not self.stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.changed.wait(remaining)
+
+                # close() writes whatever is left once the thread is gone
+                if self.stopping:
+                    return
+            self.flush()
+
+    @profiler.profiled("save.write")
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                payload = json.dumps(self.data, default=encode)
+                self.dirty = False
+
+            # write a temp file and rename it over the save, so a crash never leaves a torn file
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+
+    def close(self):
+        # stop the writer and wait out a write it has in flight, then write the last changes
+        with self.changed:
+            self.stopping = True
+            self.changed.notify()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        self.flush()
+
+    def update(self, **changes):
+        data = self.load()
+        with self.lock:
+            data.update(changes)
+        self.mark_dirty()
+
+    def get_level(self):
+        return self.load()["current_level"]
+
+    def set_level(self, level):
+        self.update(current_level=level)
+
+    def get_best(self, level):
+        return self.load()["best"].get(str(level))
+
+    def record_best(self, level, moves, pushes):
+        best = dict(self.load()["best"])
+        previous = best.get(str(level), {})
+        best[str(level)] = {
+            "moves": min(moves, previous.get("moves", moves)),
+            "pushes": min(pushes, previous.get("pushes", pushes)),
         }
-        json.dump(data, f)
-        
+        self.update(best=best)
+
+    def get_in_progress(self, level):
+        in_progress = self.load()["in_progress"]
+        if in_progress and in_progress["level"] == level:
+            moves = in_progress["moves"]
+            return steps_to_lurd(moves) if isinstance(moves, bytes) else moves
+        return None
+
+    def set_in_progress(self, level, moves):
+        # moves is a LURD string or MoveLog.packed() bytes
+        self.update(in_progress={"level": level, "moves": moves} if moves else None)
+
+saves = SaveManager()
+atexit.register(saves.close)
+
+def initiate_save_file():
+    saves.data = default_data()
+    saves.mark_dirty()
+    saves.flush()
+
 def save_game(level):
-    with open("game.json", "w") as f:
-        data = {
-            "current_level": level
-        }
-        json.dump(data, f)
-        
+    saves.set_level(level)
+
 def load_game_level():
-    if not os.path.exists("game.json"):
-        initiate_save_file()
-        
-    with open("game.json", "r") as f:
-        data = json.load(f)
-        return data["current_level"]
\ No newline at end of file
+    return saves.get_level()
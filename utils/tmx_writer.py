@@ -0,0 +1,62 @@
+import os
+
+TILESET_PATH = os.path.join("assets", "tsx", "tiles.tsx")
+
+# gids in tiles.tsx, as used by the hand made levels
+BOX_GID = 1
+WALL_GID = 3
+
+
+def layer_csv(grid, gids):
+    rows = []
+    for y in range(grid.height):
+        rows.append(",".join(str(gids[grid.index(x, y)]) for x in range(grid.width)))
+    return ",\n".join(rows)
+
+
+def write_level(path, grid, player=None):
+    # write a LevelGrid as a .tmx with the Collisions / Boxes / BoxMarkers layout Game.setup_map expects
+    player = grid.player_start if player is None else player
+    size = grid.width * grid.height
+    walls = [WALL_GID if grid.is_wall(cell) else 0 for cell in range(size)]
+    boxes = [BOX_GID if cell in grid.boxes else 0 for cell in range(size)]
+    tileset = os.path.relpath(os.path.abspath(TILESET_PATH), os.path.dirname(os.path.abspath(path)))
+
+    # markers sit in the middle of their cell
+    half = grid.tile_size / 2
+    objects = []
+    for cell in sorted(grid.goals):
+        x, y = grid.position_of(cell)
+        objects.append(("box_point", x + half, y + half))
+    if player is not None:
+        x, y = grid.position_of(player)
+        objects.append(("player", x + half, y + half))
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<map version="1.10" tiledversion="1.11.2" orientation="orthogonal" renderorder="right-down" '
+        f'width="{grid.width}" height="{grid.height}" tilewidth="{grid.tile_size}" tileheight="{grid.tile_size}" '
+        f'infinite="0" nextlayerid="5" nextobjectid="{len(objects) + 1}">',
+        f' <tileset firstgid="1" source="{tileset.replace(os.sep, "/")}"/>',
+        f' <layer id="1" name="Collisions" width="{grid.width}" height="{grid.height}">',
+        '  <data encoding="csv">',
+        layer_csv(grid, walls),
+        '</data>',
+        ' </layer>',
+        f' <layer id="3" name="Boxes" width="{grid.width}" height="{grid.height}">',
+        '  <data encoding="csv">',
+        layer_csv(grid, boxes),
+        '</data>',
+        ' </layer>',
+        ' <objectgroup id="4" name="BoxMarkers">',
+    ]
+    for object_id, (name, x, y) in enumerate(objects, 1):
+        lines.append(f'  <object id="{object_id}" name="{name}" x="{x:g}" y="{y:g}">')
+        lines.append('   <point/>')
+        lines.append('  </object>')
+    lines.append(' </objectgroup>')
+    lines.append('</map>')
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from grid import DIRECTIONS, load_level
+
+SOLUTION_EXTENSIONS = (".lurd", ".sol", ".txt")
+
+
+def find_solution(solutions_dir, level_name):
+    for extension in SOLUTION_EXTENSIONS:
+        path = os.path.join(solutions_dir, level_name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def replay(grid, moves, strict=False):
+    # replay a LURD string with the same rules as Player.move, returns (moves, pushes, error)
+    player = grid.player_start
+    pushes = 0
+    for count, move in enumerate(moves, 1):
+        if move.lower() not in DIRECTIONS:
+            return count, pushes, f"invalid move {move!r} at {count}"
+
+        result = grid.step(player, *DIRECTIONS[move.lower()])
+        if result is None:
+            return count, pushes, f"blocked move {move!r} at {count}"
+
+        player, pushed = result
+        pushes += pushed
+        if strict and pushed != move.isupper():
+            return count, pushes, f"push flag mismatch {move!r} at {count}"
+
+    if not grid.solved:
+        return len(moves), pushes, "level not solved"
+    return len(moves), pushes, None
+
+
+def verify_level(job):
+    level_path, solution_path, strict = job
+    start_time = time.perf_counter()
+    if solution_path is None:
+        return level_path, False, 0, 0, "no solution file", 0.0
+
+    with open(solution_path) as f:
+        moves = "".join(f.read().split())
+
+    moves_count, pushes, error = replay(load_level(level_path), moves, strict)
+    return level_path, error is None, moves_count, pushes, error, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay LURD solution files against the levels directory.")
+    parser.add_argument("solutions", help="directory of solutions named after the level, e.g. 1_level.lurd")
+    parser.add_argument("--levels", default="levels", help="directory of .tmx levels")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: cpu count)")
+    parser.add_argument("--strict", action="store_true", help="require uppercase moves exactly on pushes")
+    args = parser.parse_args()
+
+    jobs = []
+    for name in sorted(os.listdir(args.levels)):
+        level_name, extension = os.path.splitext(name)
+        if extension == ".tmx":
+            jobs.append((os.path.join(args.levels, name), find_solution(args.solutions, level_name), args.strict))
+
+    workers = args.workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (4 * workers))
+
+    start_time = time.perf_counter()
+    failures = total_moves = total_pushes = 0
+    with ProcessPoolExecutor(workers) as pool:
+        for level_path, passed, moves, pushes, error, elapsed in pool.map(verify_level, jobs, chunksize=chunksize):
+            failures += not passed
+            total_moves += moves
+            total_pushes += pushes
+            status = "PASS" if passed else f"FAIL ({error})"
+            print(f"{level_path}: {status} moves={moves} pushes={pushes} time={elapsed * 1000:.2f}ms")
+    elapsed = time.perf_counter() - start_time
+
+    print(
+        f"{len(jobs) - failures}/{len(jobs)} passed in {elapsed:.2f}s "
+        f"({len(jobs) / elapsed:.1f} levels/s, {total_moves / elapsed:.0f} moves/s, {total_pushes} pushes)"
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()